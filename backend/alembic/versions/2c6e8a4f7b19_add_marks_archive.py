@@ -0,0 +1,65 @@
+"""Add marks archive and group graduation date
+
+Revision ID: 2c6e8a4f7b19
+Revises: 7d4b2e9f1c36
+Create Date: 2026-10-18 21:07:33.418265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6e8a4f7b19'
+down_revision: Union[str, None] = '7d4b2e9f1c36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_marks_archive_created_at_id', ['created_at', 'id'], None),
+    ('ix_marks_archive_student_id_created_at', ['student_id', 'created_at'], ['value']),
+    ('ix_marks_archive_subject_id_created_at', ['subject_id', 'created_at'], ['value']),
+    ('ix_marks_archive_teacher_id_created_at', ['teacher_id', 'created_at'], ['value']),
+]
+
+# Архив учитывается в mark_rollups теми же триггерами, что и marks: перенос оценки агрегатов не меняет
+TRIGGERS = [
+    'CREATE TRIGGER marks_archive_rollup_insert AFTER INSERT ON marks_archive REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_archive_rollup_update AFTER UPDATE ON marks_archive REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_archive_rollup_delete AFTER DELETE ON marks_archive REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_archive_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON marks_archive FOR EACH STATEMENT EXECUTE FUNCTION table_versions_bump()',
+]
+
+
+def upgrade() -> None:
+    op.add_column('groups', sa.Column('graduated_at', sa.Date(), nullable=True))
+    op.create_table(
+        'marks_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('subject_id', sa.Integer(), nullable=False),
+        sa.Column('teacher_id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['student_id'], ['people.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['teacher_id'], ['people.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    for name, columns, include in INDEXES:
+        op.create_index(name, 'marks_archive', columns, unique=False, postgresql_include=include or [])
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+    op.execute("INSERT INTO table_versions (table_name, version) VALUES ('marks_archive', 1) ON CONFLICT DO NOTHING")
+
+
+def downgrade() -> None:
+    # Архивные оценки возвращаются в marks; триггеры на обеих таблицах сохраняют mark_rollups
+    op.execute('WITH moved AS (DELETE FROM marks_archive RETURNING id, student_id, subject_id, teacher_id, value, created_at)'
+               ' INSERT INTO marks (id, student_id, subject_id, teacher_id, value, created_at) SELECT * FROM moved')
+    op.execute("DELETE FROM table_versions WHERE table_name = 'marks_archive'")
+    op.drop_table('marks_archive')
+    op.drop_column('groups', 'graduated_at')
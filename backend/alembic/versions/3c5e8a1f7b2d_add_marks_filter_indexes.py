@@ -0,0 +1,34 @@
+"""Add marks filter indexes
+
+Revision ID: 3c5e8a1f7b2d
+Revises: 09d4014b1b3f
+Create Date: 2026-10-18 10:12:41.503127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5e8a1f7b2d'
+down_revision: Union[str, None] = '09d4014b1b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_marks_student_id_id', 'marks', ['student_id', 'id'], unique=False)
+    op.create_index('ix_marks_subject_id_id', 'marks', ['subject_id', 'id'], unique=False)
+    op.create_index('ix_marks_teacher_id_id', 'marks', ['teacher_id', 'id'], unique=False)
+    op.create_index('ix_marks_created_at_id', 'marks', ['created_at', 'id'], unique=False)
+    op.create_index(op.f('ix_people_group_id'), 'people', ['group_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_people_group_id'), table_name='people')
+    op.drop_index('ix_marks_created_at_id', table_name='marks')
+    op.drop_index('ix_marks_teacher_id_id', table_name='marks')
+    op.drop_index('ix_marks_subject_id_id', table_name='marks')
+    op.drop_index('ix_marks_student_id_id', table_name='marks')
@@ -0,0 +1,36 @@
+"""Cover student, subject and value in marks created_at indexes
+
+Revision ID: 4b9d2c7e1a58
+Revises: 8e3f5a1c2d47
+Create Date: 2026-10-19 12:41:08.263517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b9d2c7e1a58'
+down_revision: Union[str, None] = '8e3f5a1c2d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_marks_created_at_id', 'marks'),
+    ('ix_marks_archive_created_at_id', 'marks_archive'),
+]
+
+
+def upgrade() -> None:
+    # Рейтинг по предметам агрегирует оценки за период index-only scan'ом, без чтения таблицы
+    for name, table in INDEXES:
+        op.drop_index(name, table_name=table)
+        op.create_index(name, table, ['created_at', 'id'], unique=False, postgresql_include=['student_id', 'subject_id', 'value'])
+
+
+def downgrade() -> None:
+    for name, table in INDEXES:
+        op.drop_index(name, table_name=table)
+        op.create_index(name, table, ['created_at', 'id'], unique=False)
@@ -0,0 +1,121 @@
+"""Add mark_rollups table maintained by triggers
+
+Revision ID: 5a7c9e2b1d40
+Revises: 8d2f6b0c4e91
+Create Date: 2026-10-18 12:20:05.114807
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7c9e2b1d40'
+down_revision: Union[str, None] = '8d2f6b0c4e91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MARK_ROLLUP_FUNCTION = '''
+CREATE OR REPLACE FUNCTION marks_rollup_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+
+        INSERT INTO mark_rollups (dimension, day, entity_id, value_sum, value_count)
+        SELECT d.dimension, r.created_at::date, d.entity_id, sum(r.sign * r.value), sum(r.sign)
+        FROM (SELECT student_id, teacher_id, subject_id, created_at, value, 1 AS sign FROM new_rows) r
+        CROSS JOIN LATERAL (VALUES
+            ('student', r.student_id),
+            ('teacher', r.teacher_id),
+            ('subject', r.subject_id),
+            ('total', 0)
+        ) AS d(dimension, entity_id)
+        GROUP BY 1, 2, 3
+        ON CONFLICT (dimension, day, entity_id) DO UPDATE
+        SET value_sum = mark_rollups.value_sum + EXCLUDED.value_sum,
+            value_count = mark_rollups.value_count + EXCLUDED.value_count;
+
+    ELSIF TG_OP = 'UPDATE' THEN
+
+        INSERT INTO mark_rollups (dimension, day, entity_id, value_sum, value_count)
+        SELECT d.dimension, r.created_at::date, d.entity_id, sum(r.sign * r.value), sum(r.sign)
+        FROM (SELECT student_id, teacher_id, subject_id, created_at, value, 1 AS sign FROM new_rows UNION ALL SELECT student_id, teacher_id, subject_id, created_at, value, -1 AS sign FROM old_rows) r
+        CROSS JOIN LATERAL (VALUES
+            ('student', r.student_id),
+            ('teacher', r.teacher_id),
+            ('subject', r.subject_id),
+            ('total', 0)
+        ) AS d(dimension, entity_id)
+        GROUP BY 1, 2, 3
+        ON CONFLICT (dimension, day, entity_id) DO UPDATE
+        SET value_sum = mark_rollups.value_sum + EXCLUDED.value_sum,
+            value_count = mark_rollups.value_count + EXCLUDED.value_count;
+
+    ELSE
+
+        INSERT INTO mark_rollups (dimension, day, entity_id, value_sum, value_count)
+        SELECT d.dimension, r.created_at::date, d.entity_id, sum(r.sign * r.value), sum(r.sign)
+        FROM (SELECT student_id, teacher_id, subject_id, created_at, value, -1 AS sign FROM old_rows) r
+        CROSS JOIN LATERAL (VALUES
+            ('student', r.student_id),
+            ('teacher', r.teacher_id),
+            ('subject', r.subject_id),
+            ('total', 0)
+        ) AS d(dimension, entity_id)
+        GROUP BY 1, 2, 3
+        ON CONFLICT (dimension, day, entity_id) DO UPDATE
+        SET value_sum = mark_rollups.value_sum + EXCLUDED.value_sum,
+            value_count = mark_rollups.value_count + EXCLUDED.value_count;
+
+    END IF;
+    RETURN NULL;
+END
+$$
+'''
+
+MARK_ROLLUP_TRIGGERS = [
+    'CREATE TRIGGER marks_rollup_insert AFTER INSERT ON marks REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_rollup_update AFTER UPDATE ON marks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_rollup_delete AFTER DELETE ON marks REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+]
+
+MARK_ROLLUP_BACKFILL = '''
+        INSERT INTO mark_rollups (dimension, day, entity_id, value_sum, value_count)
+        SELECT d.dimension, r.created_at::date, d.entity_id, sum(r.sign * r.value), sum(r.sign)
+        FROM (SELECT student_id, teacher_id, subject_id, created_at, value, 1 AS sign FROM marks) r
+        CROSS JOIN LATERAL (VALUES
+            ('student', r.student_id),
+            ('teacher', r.teacher_id),
+            ('subject', r.subject_id),
+            ('total', 0)
+        ) AS d(dimension, entity_id)
+        GROUP BY 1, 2, 3
+        ON CONFLICT (dimension, day, entity_id) DO UPDATE
+        SET value_sum = mark_rollups.value_sum + EXCLUDED.value_sum,
+            value_count = mark_rollups.value_count + EXCLUDED.value_count;
+'''
+
+
+def upgrade() -> None:
+    op.create_table('mark_rollups',
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('value_sum', sa.BigInteger(), nullable=False),
+    sa.Column('value_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'day', 'entity_id')
+    )
+    op.execute(MARK_ROLLUP_FUNCTION)
+    for trigger in MARK_ROLLUP_TRIGGERS:
+        op.execute(trigger)
+    # Заполняем агрегаты по уже существующим оценкам
+    op.execute(MARK_ROLLUP_BACKFILL)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS marks_rollup_delete ON marks')
+    op.execute('DROP TRIGGER IF EXISTS marks_rollup_update ON marks')
+    op.execute('DROP TRIGGER IF EXISTS marks_rollup_insert ON marks')
+    op.execute('DROP FUNCTION IF EXISTS marks_rollup_apply()')
+    op.drop_table('mark_rollups')
@@ -0,0 +1,30 @@
+"""Rotate refresh tokens in place within a session
+
+Revision ID: 6f1c3e8b2a94
+Revises: 4b9d2c7e1a58
+Create Date: 2026-10-20 09:26:51.530187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f1c3e8b2a94'
+down_revision: Union[str, None] = '4b9d2c7e1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Раньше каждая ротация добавляла строку; погашенные и истёкшие строки больше не нужны
+    op.execute('DELETE FROM refresh_tokens WHERE revoked_at IS NOT NULL OR expires_at <= now()')
+    op.add_column('refresh_tokens', sa.Column('session_id', sa.String(length=32), nullable=True))
+    op.create_unique_constraint('refresh_tokens_session_id_key', 'refresh_tokens', ['session_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('refresh_tokens_session_id_key', 'refresh_tokens', type_='unique')
+    op.drop_column('refresh_tokens', 'session_id')
@@ -0,0 +1,120 @@
+"""Partition marks by academic year
+
+Revision ID: 7d4b2e9f1c36
+Revises: f9b1e7c3a820
+Create Date: 2026-10-18 19:42:51.206337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4b2e9f1c36'
+down_revision: Union[str, None] = 'f9b1e7c3a820'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MARK_PARTITION_FUNCTION = '''
+CREATE OR REPLACE FUNCTION marks_ensure_partition(day date) RETURNS text LANGUAGE plpgsql AS $$
+DECLARE
+    start_year int := extract(year FROM day)::int - CASE WHEN extract(month FROM day) < 9 THEN 1 ELSE 0 END;
+    start_day date := make_date(start_year, 9, 1);
+    end_day date := make_date(start_year + 1, 9, 1);
+    partition_name text := 'marks_y' || start_year;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('marks_ensure_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE marks INCLUDING DEFAULTS)', partition_name);
+    IF to_regclass('marks_default') IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM marks_default WHERE created_at >= %L AND created_at < %L RETURNING *)'
+            ' INSERT INTO %I SELECT * FROM moved',
+            start_day, end_day, partition_name
+        );
+    END IF;
+    EXECUTE format('ALTER TABLE marks ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', partition_name, start_day, end_day);
+    RETURN partition_name;
+END
+$$
+'''
+
+# Секции на каждый учебный год с оценками и на следующий за текущим
+CREATE_PARTITIONS = '''
+SELECT marks_ensure_partition(make_date(year::int, 9, 1))
+FROM generate_series(
+    (SELECT extract(year FROM coalesce(min(created_at), now()) - interval '8 months') FROM marks_unpartitioned),
+    extract(year FROM now() - interval '8 months') + 1
+) AS year
+'''
+
+INDEXES = [
+    ('ix_marks_student_id_id', ['student_id', 'id'], None),
+    ('ix_marks_subject_id_id', ['subject_id', 'id'], None),
+    ('ix_marks_teacher_id_id', ['teacher_id', 'id'], None),
+    ('ix_marks_created_at_id', ['created_at', 'id'], None),
+    ('ix_marks_student_id_created_at', ['student_id', 'created_at'], ['value']),
+    ('ix_marks_subject_id_created_at', ['subject_id', 'created_at'], ['value']),
+    ('ix_marks_teacher_id_created_at', ['teacher_id', 'created_at'], ['value']),
+]
+
+TRIGGERS = [
+    'CREATE TRIGGER marks_rollup_insert AFTER INSERT ON marks REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_rollup_update AFTER UPDATE ON marks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_rollup_delete AFTER DELETE ON marks REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()',
+    'CREATE TRIGGER marks_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON marks FOR EACH STATEMENT EXECUTE FUNCTION table_versions_bump()',
+]
+
+
+def _copy_marks(old_table: str) -> None:
+    # Строки переносятся без триггеров: mark_rollups уже учитывают все оценки.
+    # Последовательность id переходит к новой таблице, чтобы не удалиться вместе со старой
+    op.execute(f'INSERT INTO marks (id, student_id, subject_id, teacher_id, value, created_at)'
+               f' SELECT id, student_id, subject_id, teacher_id, value, created_at FROM {old_table}')
+    op.execute(f'''
+DO $$
+DECLARE
+    seq text := pg_get_serial_sequence('{old_table}', 'id');
+BEGIN
+    IF seq IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY marks.id', seq);
+    END IF;
+END
+$$
+''')
+    op.execute(f'DROP TABLE {old_table} CASCADE')
+
+
+def _finish_marks(primary_key: list) -> None:
+    # Ключи, индексы и триггеры создаются после загрузки данных - так быстрее
+    op.create_primary_key('marks_pkey', 'marks', primary_key)
+    op.create_foreign_key('marks_student_id_fkey', 'marks', 'people', ['student_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('marks_subject_id_fkey', 'marks', 'subjects', ['subject_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('marks_teacher_id_fkey', 'marks', 'people', ['teacher_id'], ['id'], ondelete='CASCADE')
+    for name, columns, include in INDEXES:
+        op.create_index(name, 'marks', columns, unique=False, postgresql_include=include or [])
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+
+
+def upgrade() -> None:
+    op.execute(MARK_PARTITION_FUNCTION)
+    op.execute('ALTER TABLE marks RENAME TO marks_unpartitioned')
+    op.execute('CREATE TABLE marks (LIKE marks_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+    op.execute('CREATE TABLE marks_default PARTITION OF marks DEFAULT')
+    op.execute(CREATE_PARTITIONS)
+    _copy_marks('marks_unpartitioned')
+    # В первичный ключ секционированной таблицы обязан входить ключ секционирования
+    _finish_marks(['id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE marks RENAME TO marks_partitioned')
+    op.execute('CREATE TABLE marks (LIKE marks_partitioned INCLUDING DEFAULTS)')
+    _copy_marks('marks_partitioned')
+    _finish_marks(['id'])
+    op.execute('DROP FUNCTION IF EXISTS marks_ensure_partition(date)')
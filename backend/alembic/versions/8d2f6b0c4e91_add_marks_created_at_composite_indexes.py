@@ -0,0 +1,31 @@
+"""Add marks created_at composite indexes
+
+Revision ID: 8d2f6b0c4e91
+Revises: 3c5e8a1f7b2d
+Create Date: 2026-10-18 11:03:27.918364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6b0c4e91'
+down_revision: Union[str, None] = '3c5e8a1f7b2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # INCLUDE (value) позволяет считать avg(value) index-only scan'ом
+    op.create_index('ix_marks_student_id_created_at', 'marks', ['student_id', 'created_at'], unique=False, postgresql_include=['value'])
+    op.create_index('ix_marks_subject_id_created_at', 'marks', ['subject_id', 'created_at'], unique=False, postgresql_include=['value'])
+    op.create_index('ix_marks_teacher_id_created_at', 'marks', ['teacher_id', 'created_at'], unique=False, postgresql_include=['value'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_marks_teacher_id_created_at', table_name='marks')
+    op.drop_index('ix_marks_subject_id_created_at', table_name='marks')
+    op.drop_index('ix_marks_student_id_created_at', table_name='marks')
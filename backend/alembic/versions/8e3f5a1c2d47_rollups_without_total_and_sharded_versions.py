@@ -0,0 +1,102 @@
+"""Drop total rollup row, order rollup upserts, shard table_versions
+
+Revision ID: 8e3f5a1c2d47
+Revises: 2c6e8a4f7b19
+Create Date: 2026-10-19 10:14:27.905318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3f5a1c2d47'
+down_revision: Union[str, None] = '2c6e8a4f7b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE_VERSION_SHARDS = 8
+
+NEW_ROWS = 'SELECT student_id, teacher_id, subject_id, created_at, value, 1 AS sign FROM new_rows'
+OLD_ROWS = 'SELECT student_id, teacher_id, subject_id, created_at, value, -1 AS sign FROM old_rows'
+
+# Каждое соединение увеличивает строку своего сегмента, версия таблицы - сумма сегментов
+SHARDED_VERSION_FUNCTION = f'''
+CREATE OR REPLACE FUNCTION table_versions_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, shard, version) VALUES (TG_TABLE_NAME, pg_backend_pid() % {TABLE_VERSION_SHARDS}, 1)
+    ON CONFLICT (table_name, shard) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
+'''
+
+SINGLE_VERSION_FUNCTION = '''
+CREATE OR REPLACE FUNCTION table_versions_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
+'''
+
+
+def _rollup_function(dimensions: str, order_by: str) -> str:
+    upsert = f'''
+        INSERT INTO mark_rollups (dimension, day, entity_id, value_sum, value_count)
+        SELECT d.dimension, r.created_at::date, d.entity_id, sum(r.sign * r.value), sum(r.sign)
+        FROM ({{rows}}) r
+        CROSS JOIN LATERAL (VALUES {dimensions}) AS d(dimension, entity_id)
+        GROUP BY 1, 2, 3{order_by}
+        ON CONFLICT (dimension, day, entity_id) DO UPDATE
+        SET value_sum = mark_rollups.value_sum + EXCLUDED.value_sum,
+            value_count = mark_rollups.value_count + EXCLUDED.value_count;
+'''
+    return f'''
+CREATE OR REPLACE FUNCTION marks_rollup_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+{upsert.format(rows=NEW_ROWS)}
+    ELSIF TG_OP = 'UPDATE' THEN
+{upsert.format(rows=NEW_ROWS + ' UNION ALL ' + OLD_ROWS)}
+    ELSE
+{upsert.format(rows=OLD_ROWS)}
+    END IF;
+    RETURN NULL;
+END
+$$
+'''
+
+
+def upgrade() -> None:
+    # Итоги за день больше не хранятся отдельной строкой: её обновлял каждый оператор записи в marks
+    op.execute(_rollup_function("('student', r.student_id), ('teacher', r.teacher_id), ('subject', r.subject_id)", '\n        ORDER BY 1, 2, 3'))
+    op.execute("DELETE FROM mark_rollups WHERE dimension = 'total'")
+
+    op.add_column('table_versions', sa.Column('shard', sa.SmallInteger(), server_default='0', nullable=False))
+    op.drop_constraint('table_versions_pkey', 'table_versions', type_='primary')
+    op.create_primary_key('table_versions_pkey', 'table_versions', ['table_name', 'shard'])
+    op.execute(SHARDED_VERSION_FUNCTION)
+
+
+def downgrade() -> None:
+    # Сегменты счётчика складываются в одну строку, итоги за день восстанавливаются из строк предметов
+    op.execute(SINGLE_VERSION_FUNCTION)
+    op.execute('''
+CREATE TEMPORARY TABLE table_versions_sum ON COMMIT DROP AS
+SELECT table_name, sum(version)::bigint AS version FROM table_versions GROUP BY table_name
+''')
+    op.execute('DELETE FROM table_versions')
+    op.drop_constraint('table_versions_pkey', 'table_versions', type_='primary')
+    op.drop_column('table_versions', 'shard')
+    op.create_primary_key('table_versions_pkey', 'table_versions', ['table_name'])
+    op.execute('INSERT INTO table_versions (table_name, version) SELECT table_name, version FROM table_versions_sum')
+
+    op.execute(_rollup_function("('student', r.student_id), ('teacher', r.teacher_id), ('subject', r.subject_id), ('total', 0)", ''))
+    op.execute('''
+INSERT INTO mark_rollups (dimension, day, entity_id, value_sum, value_count)
+SELECT 'total', day, 0, sum(value_sum), sum(value_count) FROM mark_rollups WHERE dimension = 'subject' GROUP BY day
+''')
@@ -0,0 +1,26 @@
+"""Add users token_version
+
+Revision ID: b7e3d1a94c52
+Revises: 5a7c9e2b1d40
+Create Date: 2026-10-18 14:12:05.301847
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3d1a94c52'
+down_revision: Union[str, None] = '5a7c9e2b1d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
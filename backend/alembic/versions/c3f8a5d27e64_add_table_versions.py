@@ -0,0 +1,53 @@
+"""Add table_versions maintained by triggers
+
+Revision ID: c3f8a5d27e64
+Revises: e4a9c2f61b08
+Create Date: 2026-10-18 16:21:48.530612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a5d27e64'
+down_revision: Union[str, None] = 'e4a9c2f61b08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE_VERSION_FUNCTION = '''
+CREATE OR REPLACE FUNCTION table_versions_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
+'''
+
+TABLES = ('groups', 'subjects')
+
+
+def upgrade() -> None:
+    op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute(TABLE_VERSION_FUNCTION)
+    for table in TABLES:
+        op.execute(f'''
+CREATE TRIGGER {table}_version_bump
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+FOR EACH STATEMENT EXECUTE FUNCTION table_versions_bump();
+''')
+        op.execute(f"INSERT INTO table_versions (table_name, version) VALUES ('{table}', 1)")
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_version_bump ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS table_versions_bump()')
+    op.drop_table('table_versions')
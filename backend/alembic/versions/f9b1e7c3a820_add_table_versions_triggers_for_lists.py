@@ -0,0 +1,36 @@
+"""Add table_versions triggers for people, marks and users
+
+Revision ID: f9b1e7c3a820
+Revises: c3f8a5d27e64
+Create Date: 2026-10-18 17:05:12.448019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f9b1e7c3a820'
+down_revision: Union[str, None] = 'c3f8a5d27e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('people', 'marks', 'users')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.execute(f'''
+CREATE TRIGGER {table}_version_bump
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+FOR EACH STATEMENT EXECUTE FUNCTION table_versions_bump();
+''')
+        op.execute(f"INSERT INTO table_versions (table_name, version) VALUES ('{table}', 1) ON CONFLICT DO NOTHING")
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_version_bump ON {table}')
+        op.execute(f"DELETE FROM table_versions WHERE table_name = '{table}'")
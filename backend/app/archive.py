@@ -0,0 +1,164 @@
+# Архив исторических оценок: marks_archive хранит оценки старше MARK_ARCHIVE_AFTER_DAYS дней
+# и оценки студентов выпущенных групп. Рабочая таблица marks остаётся небольшой, а чтения
+# подключают архив через UNION ALL только тогда, когда диапазон дат запроса до него доходит.
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import ClauseAdapter
+from app.models import Group, Mark, MarkArchive, Person, TableVersion
+
+# Оценки старше стольких дней переносятся в архив
+MARK_ARCHIVE_AFTER_DAYS = int(os.getenv("MARK_ARCHIVE_AFTER_DAYS", 5 * 365))
+# Сколько оценок переносится одной транзакцией
+MARK_ARCHIVE_BATCH_SIZE = int(os.getenv("MARK_ARCHIVE_BATCH_SIZE", 5000))
+# Как часто (в секундах) воркер сверяет счётчики архива в table_versions
+MARK_ARCHIVE_POLL_INTERVAL = float(os.getenv("MARK_ARCHIVE_POLL_INTERVAL", 5))
+
+MARK_COLUMNS = ("id", "student_id", "subject_id", "teacher_id", "value", "created_at")
+# Таблицы, от которых зависят границы архива (ArchiveExtent)
+ARCHIVE_EXTENT_TABLES = (MarkArchive.__tablename__, Person.__tablename__, Group.__tablename__)
+
+# Рабочие и архивные оценки как одна таблица с теми же столбцами, что у marks
+marks_with_archive = union_all(
+    select(*[Mark.__table__.c[name] for name in MARK_COLUMNS]),
+    select(*[MarkArchive.__table__.c[name] for name in MARK_COLUMNS]),
+).subquery("marks_all")
+
+
+def archive_conditions(cutoff: datetime) -> list:
+    # Два прохода вместо одного OR: первый идёт по индексу (created_at, id) и только по старым
+    # секциям marks, второй - по индексу студента для выпущенных групп
+    graduated = select(Person.id).join(Group, Group.id == Person.group_id).where(Group.graduated_at.is_not(None))
+    return [
+        (Mark.created_at < cutoff, (Mark.created_at, Mark.id)),
+        (Mark.student_id.in_(graduated), (Mark.student_id, Mark.id)),
+    ]
+
+
+def archive_marks(db: Session, cutoff: datetime | None = None, batch_size: int = MARK_ARCHIVE_BATCH_SIZE) -> dict:
+    # Каждая пачка переносится одним оператором DELETE ... RETURNING внутри INSERT и фиксируется
+    # отдельно: блокировки короткие, а прерванный перенос можно просто запустить заново.
+    # Триггеры mark_rollups вычитают пачку из marks и добавляют её же из архива, так что отчёты не меняются
+    cutoff = cutoff or datetime.utcnow() - timedelta(days=MARK_ARCHIVE_AFTER_DAYS)
+    report = {"cutoff": cutoff, "moved": 0, "batches": 0}
+    for condition, order in archive_conditions(cutoff):
+        while True:
+            batch = select(Mark.id, Mark.created_at).where(condition).order_by(*order).limit(batch_size)
+            moved = delete(Mark).where(tuple_(Mark.id, Mark.created_at).in_(batch))\
+                .returning(*[Mark.__table__.c[name] for name in MARK_COLUMNS]).cte("moved")
+            count = db.execute(insert(MarkArchive).from_select(MARK_COLUMNS, select(moved))).rowcount
+            db.commit()
+            if count:
+                report["moved"] += count
+                report["batches"] += 1
+            if count < batch_size:
+                break
+    return report
+
+
+class ArchiveExtent:
+    # Что лежит в архиве. Оценки попадают туда по двум правилам, поэтому границ тоже две:
+    # dated - самая поздняя архивная оценка студентов невыпущенных групп (перенос по дате),
+    # graduated - самая поздняя оценка студентов выпущенных групп; у них оценки свежие, и одна
+    # общая граница тянула бы архив почти во все запросы. Поэтому для выпускников хранятся
+    # ещё их id и группы: запрос с фильтром по другому студенту или группе архив не читает
+    def __init__(self, dated: datetime | None, graduated: datetime | None, students: frozenset, groups: frozenset):
+        self.dated = dated
+        self.graduated = graduated
+        self.students = students
+        self.groups = groups
+
+
+def _versions_statement():
+    # Разделение оценок на два правила зависит от групп студентов и дат выпуска, поэтому
+    # кроме счётчика marks_archive учитываются счётчики people и groups
+    return select(TableVersion.table_name, func.sum(TableVersion.version))\
+        .where(TableVersion.table_name.in_(ARCHIVE_EXTENT_TABLES)).group_by(TableVersion.table_name)
+
+
+def _extent_statements():
+    graduated = select(Person.id).join(Group, Group.id == Person.group_id).where(Group.graduated_at.is_not(None))
+    dated = select(func.max(MarkArchive.created_at)).where(MarkArchive.student_id.not_in(graduated))
+    # Последняя архивная оценка каждого выпускника читается по индексу (student_id, created_at)
+    last_mark = select(func.max(MarkArchive.created_at)).where(MarkArchive.student_id == Person.id).scalar_subquery()
+    graduates = select(Person.id, Person.group_id, last_mark.label("last_mark"))\
+        .join(Group, Group.id == Person.group_id).where(Group.graduated_at.is_not(None), last_mark.is_not(None))
+    return dated, graduates
+
+
+def _extent(dated: datetime | None, graduates: list) -> ArchiveExtent:
+    return ArchiveExtent(
+        dated,
+        max((row.last_mark for row in graduates), default=None),
+        frozenset(row.id for row in graduates),
+        frozenset(row.group_id for row in graduates),
+    )
+
+
+class ArchiveHorizon:
+    # Границы архива для текущего воркера; перечитываются при изменении счётчиков ARCHIVE_EXTENT_TABLES,
+    # которые сверяются не чаще раза в MARK_ARCHIVE_POLL_INTERVAL секунд
+    def __init__(self):
+        self._db_versions = None
+        self._value = None
+        self._polled_at = None
+
+    def _stale(self) -> bool:
+        return self._polled_at is None or time.monotonic() - self._polled_at >= MARK_ARCHIVE_POLL_INTERVAL
+
+    async def get(self, db: AsyncSession) -> ArchiveExtent:
+        if self._stale():
+            versions = dict((await db.execute(_versions_statement())).all())
+            if versions != self._db_versions or self._value is None:
+                dated, graduates = _extent_statements()
+                self._value = _extent(await db.scalar(dated), (await db.execute(graduates)).all())
+                self._db_versions = versions
+            self._polled_at = time.monotonic()
+        return self._value
+
+    def get_sync(self, db: Session) -> ArchiveExtent:
+        if self._stale():
+            versions = dict(db.execute(_versions_statement()).all())
+            if versions != self._db_versions or self._value is None:
+                dated, graduates = _extent_statements()
+                self._value = _extent(db.scalar(dated), db.execute(graduates).all())
+                self._db_versions = versions
+            self._polled_at = time.monotonic()
+        return self._value
+
+    def invalidate(self):
+        self._polled_at = None
+
+
+archive_horizon = ArchiveHorizon()
+
+
+def _starts_before(start, horizon: datetime | None) -> bool:
+    if horizon is None:
+        return False
+    if start is None:
+        return True
+    if not isinstance(start, datetime):
+        start = datetime.combine(start, datetime.min.time())
+    return start <= horizon
+
+
+def reaches_archive(extent: ArchiveExtent, start, student_id: int | None = None, group_id: int | None = None) -> bool:
+    # start - начало диапазона дат запроса (date или datetime), None - без нижней границы;
+    # student_id и group_id - фильтры запроса по студенту и его текущей группе
+    if _starts_before(start, extent.dated):
+        return True
+    if not _starts_before(start, extent.graduated):
+        return False
+    if student_id is None and group_id is None:
+        return True
+    return student_id in extent.students or group_id in extent.groups
+
+
+def include_archive(statement, keys: list = ()):
+    # Подменяет marks на marks_with_archive во всём запросе, включая WHERE, CTE и ключи сортировки
+    adapter = ClauseAdapter(marks_with_archive)
+    return adapter.traverse(statement), [adapter.traverse(Mark.__table__.c[key.key]) for key in keys]
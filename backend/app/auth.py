@@ -2,35 +2,39 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import timedelta, datetime
-from app.models import User
-from app.database import SessionLocal
-from sqlalchemy.orm import Session
+from app.models import User, RefreshToken
+from app.schemas import RefreshRequest
+from app.database import get_db, get_async_db
+from app.cache import token_version_cache, data_versions, table_versions
+from app.hashing import password_hasher
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
 import os
+import secrets
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 14))
+# Как часто (в секундах) воркер сверяет счётчик users в table_versions. Отзыв токенов (выход,
+# смена пароля, удаление) через этот же воркер действует сразу, через другой - не позже чем через интервал
+TOKEN_VERSION_POLL_INTERVAL = float(os.getenv("TOKEN_VERSION_POLL_INTERVAL", 1))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.login == username).first()
-    if user and pwd_context.verify(password, user.password_hash):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    # bcrypt выполняется в отдельном пуле, цикл событий и потоки Starlette в это время свободны
+    user = (await db.scalars(select(User).options(selectinload(User.person)).where(User.login == username))).first()
+    if user and await password_hasher.verify(password, user.password_hash):
         return user
     return None
 
@@ -43,34 +47,144 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def user_claims(user: User) -> dict:
+    # Роль, связанный человек и версия токена подписываются в JWT, чтобы проверка прав не ходила в БД
+    return {
+        "sub": str(user.id),
+        "person_id": str(user.person_id) if user.person_id else None,
+        "role": user.role,
+        "ver": user.token_version,
+    }
+
+# Счётчик users из table_versions и момент его последней сверки в этом процессе
+_users_version = {"version": None, "polled_at": None}
+
+async def _poll_users_version(db: AsyncSession):
+    # Счётчик читается асинхронной сессией не чаще раза в TOKEN_VERSION_POLL_INTERVAL. Момент сверки
+    # занимается до запроса, поэтому одновременные запросы в это время продолжают работать со старым значением
+    polled_at = _users_version["polled_at"]
+    now = time.monotonic()
+    if _users_version["version"] is not None and polled_at is not None and now - polled_at < TOKEN_VERSION_POLL_INTERVAL:
+        return
+    _users_version["polled_at"] = now
+    try:
+        version = (await table_versions(db, ("users",)))[0]
+        if version != _users_version["version"] and _users_version["version"] is not None:
+            await _reload_token_versions(db, version)
+    except Exception:
+        _users_version["polled_at"] = polled_at
+        raise
+    _users_version["version"] = version
+
+async def _reload_token_versions(db: AsyncSession, users_version: int):
+    # После записи в users версии всех закэшированных пользователей перечитываются одним запросом,
+    # а не отдельным запросом на каждого пользователя при его следующем обращении
+    user_ids = token_version_cache.keys()
+    versions = (data_versions.snapshot(("users",)), users_version)
+    current = dict((await db.execute(select(User.id, User.token_version).where(User.id.in_(user_ids)))).all()) if user_ids else {}
+    for user_id in user_ids:
+        token_version_cache.set(user_id, versions, (current.get(user_id),))
+
+async def get_token_version(db: AsyncSession, user_id: int) -> int | None:
+    # Текущая версия токенов пользователя; None - пользователь удалён.
+    # Отзыв через этот процесс (data_versions) действует сразу, через другой воркер (счётчик users
+    # в table_versions) - не позже чем через TOKEN_VERSION_POLL_INTERVAL секунд
+    await _poll_users_version(db)
+    versions = (data_versions.snapshot(("users",)), _users_version["version"])
+    cached = token_version_cache.get(user_id, versions)
+    if cached is not None:
+        return cached[0]
+    token_version = await db.scalar(select(User.token_version).where(User.id == user_id))
+    token_version_cache.set(user_id, versions, (token_version,))
+    return token_version
+
+def revoke_tokens(user: User):
+    # Выданные ранее токены перестают приниматься после commit и сброса кэша версий
+    user.token_version = (user.token_version or 0) + 1
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    # Сессия подключается к БД только при сверке счётчика users или промахе кэша версий
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        user = db.query(User).filter(User.id == user_id).first()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"}
-            )
-        return user
-    except JWTError:
+        user_id = int(payload["sub"])
+        role = payload["role"]
+        token_version = payload["ver"]
+        person_id = payload.get("person_id")
+    except (JWTError, KeyError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    current_version = await get_token_version(db, user_id)
+    if current_version is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    if current_version != token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Пользователь собирается из подписанных claims и не привязан к сессии
+    return User(
+        id=user_id,
+        role=role,
+        person_id=int(person_id) if person_id else None,
+        token_version=token_version,
+    )
+
+def _hash_refresh_token(token: str) -> str:
+    # Refresh-токен - случайная строка с высокой энтропией, поэтому достаточно быстрого sha256, а не bcrypt
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _refresh_session_id(token: str) -> str | None:
+    # Токен имеет вид <id сессии>.<секрет>; у токенов, выданных до появления сессий, id нет
+    session_id, separator, _ = token.partition(".")
+    return session_id if separator else None
+
+def _new_refresh_token(session_id: str) -> str:
+    return f"{session_id}.{secrets.token_urlsafe(32)}"
+
+def issue_refresh_token(db: Session, user: User) -> str:
+    session_id = secrets.token_urlsafe(12)
+    token = _new_refresh_token(session_id)
+    db.add(RefreshToken(
+        user_id=user.id,
+        session_id=session_id,
+        token_hash=_hash_refresh_token(token),
+        token_version=user.token_version,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+def _stale_refresh_tokens(user_id: int, now: datetime):
+    # Отозванные и истёкшие сессии пользователя больше ни для чего не нужны
+    return delete(RefreshToken).where(
+        RefreshToken.user_id == user_id,
+        or_(RefreshToken.revoked_at.is_not(None), RefreshToken.expires_at <= now),
+    )
+
+def _token_response(db: Session, user: User, refresh_token: str | None = None) -> dict:
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=user_claims(user),
+        expires_delta=access_token_expires,
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token or issue_refresh_token(db, user),
+        "token_type": "bearer",
+    }
+
 @router.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,19 +195,14 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     # Получаем связанные данные `Person` (если есть)
     person = user.person
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "person_id": str(person.id) if person else None,
-        },
-        expires_delta=access_token_expires,
-    )
+    # Заодно удаляем отозванные и истёкшие сессии пользователя, чтобы таблица не росла
+    await db.execute(_stale_refresh_tokens(user.id, datetime.utcnow()))
+    tokens = _token_response(db, user)
+    await db.commit()
 
     # Возвращаем информацию о пользователе
     return {
-        "access_token": access_token,
-        "token_type": "bearer",
+        **tokens,
         "username": user.login,
         "person": {
             "first_name": person.first_name if person else None,
@@ -101,3 +210,58 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             "father_name": person.father_name if person else None,
         } if person else None,
     }
+
+@router.post("/refresh")
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    # Ротация на месте: строка сессии блокируется и получает хэш нового токена, срок сессии не меняется.
+    # Из двух одновременных запросов с одним токеном второй после блокировки уже не найдёт строку по хэшу
+    now = datetime.utcnow()
+    token_hash = _hash_refresh_token(request.refresh_token)
+    session_id = _refresh_session_id(request.refresh_token)
+    row = db.scalars(
+        select(RefreshToken)
+        .where(RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_(None), RefreshToken.expires_at > now)
+        .with_for_update()
+    ).first()
+
+    if row is None:
+        # Старый токен ещё живой сессии или отозванный токен - признак утечки: отзываем все токены пользователя
+        reuse = [and_(RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_not(None))]
+        if session_id is not None:
+            reuse.append(and_(RefreshToken.session_id == session_id, RefreshToken.token_hash != token_hash))
+        reused = db.scalar(select(RefreshToken.user_id).where(or_(*reuse)).limit(1))
+        if reused is not None:
+            db.execute(update(RefreshToken).where(RefreshToken.user_id == reused, RefreshToken.revoked_at.is_(None)).values(revoked_at=now))
+            db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user = db.query(User).filter(User.id == row.user_id).first()
+    # Изменение или отзыв пользователя (users.token_version) делает недействительными и refresh-токены
+    if user is None or user.token_version != row.token_version:
+        row.revoked_at = now
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Токены, выданные до появления сессий, получают id сессии при первой ротации
+    row.session_id = row.session_id or secrets.token_urlsafe(12)
+    token = _new_refresh_token(row.session_id)
+    row.token_hash = _hash_refresh_token(token)
+    db.execute(_stale_refresh_tokens(user.id, now))
+    tokens = _token_response(db, user, token)
+    db.commit()
+    return tokens
+
+@router.post("/logout")
+def logout(request: RefreshRequest, db: Session = Depends(get_db)):
+    db.query(RefreshToken).filter(RefreshToken.token_hash == _hash_refresh_token(request.refresh_token), RefreshToken.revoked_at.is_(None))\
+        .update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return {"detail": "Logged out"}
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import TableVersion
+
+
+class DataVersions:
+    # Счётчики изменений по таблицам. Эндпоинты записи увеличивают счётчик после commit,
+    # а закэшированный результат помнит версии таблиц, из которых он посчитан
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = defaultdict(int)
+
+    def bump(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+
+    def snapshot(self, tables) -> tuple:
+        with self._lock:
+            return tuple(self._versions[table] for table in tables)
+
+
+async def table_versions(db: AsyncSession, tables) -> tuple:
+    # Счётчики изменений из table_versions (сумма сегментов) одним запросом по первичному ключу.
+    # Их увеличивают триггеры, поэтому запись через любой воркер видна всем процессам сразу
+    versions = dict((await db.execute(
+        select(TableVersion.table_name, func.sum(TableVersion.version))
+        .where(TableVersion.table_name.in_(tables)).group_by(TableVersion.table_name)
+    )).all())
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+class ResultCache:
+    # LRU-кэш с TTL; запись считается устаревшей, если изменилась версия любой её таблицы
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, versions: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_versions, expires_at, value = entry
+                if entry_versions == versions and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, versions: tuple, value):
+        with self._lock:
+            self._entries[key] = (versions, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+data_versions = DataVersions()
+
+# Версии токенов пользователей для проверки JWT без запроса к БД на каждый запрос.
+# Записи сверяются со счётчиком users (см. app.auth.TOKEN_VERSION_POLL_INTERVAL), TTL ограничивает размер кэша
+token_version_cache = ResultCache(
+    maxsize=int(os.getenv("TOKEN_VERSION_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("TOKEN_VERSION_CACHE_TTL", 60)),
+)
+
+# Кэш отчётов по среднему баллу. Записи сверяются со счётчиками table_versions,
+# TTL только ограничивает время жизни редко запрашиваемых отчётов
+average_grade_cache = ResultCache(
+    maxsize=int(os.getenv("AVERAGE_GRADE_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("AVERAGE_GRADE_CACHE_TTL", 300)),
+)
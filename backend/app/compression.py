@@ -0,0 +1,151 @@
+import os
+import zlib
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Ответы меньше этого размера отправляются как есть: выигрыш не окупает заголовки и CPU
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+
+# Кодировки в порядке предпочтения сервера
+ENCODINGS = ("br", "gzip")
+
+
+def etag_suffix(encoding: str) -> str:
+    # Сжатый ответ - другое представление, поэтому к сильному ETag добавляется суффикс кодировки
+    return f"-{encoding}"
+
+
+def _accepted(accept_encoding: str) -> str | None:
+    # Разбор Accept-Encoding с учётом q=0
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 - формат gzip
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    # Сжатие ответов gzip или brotli по Accept-Encoding клиента, включая потоковые (выгрузка оценок)
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    @staticmethod
+    def _eligible(headers: Headers, status: int) -> bool:
+        # Ответ, который мог бы быть сжат при другом Accept-Encoding или размере
+        return "content-encoding" not in headers and status != 204
+
+    @staticmethod
+    def _mark_encoded(headers: MutableHeaders, encoding: str):
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and etag.endswith('"'):
+            headers["ETag"] = etag[:-1] + etag_suffix(encoding) + '"'
+
+    @staticmethod
+    def _mark_not_modified(headers: MutableHeaders, if_none_match: str):
+        # 304 подтверждает то представление, которое уже есть у клиента: суффикс кодировки ставится,
+        # только если клиент прислал ETag сжатого ответа, а несжатый (маленький) ответ остаётся без суффикса
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if not etag or not etag.endswith('"'):
+            return
+        sent = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        for encoding in ENCODINGS:
+            if etag[:-1] + etag_suffix(encoding) + '"' in sent:
+                headers["ETag"] = etag[:-1] + etag_suffix(encoding) + '"'
+                return
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = _accepted(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            async def send_identity(message: Message):
+                # Несжатый ответ тоже зависит от Accept-Encoding: кэши не должны отдавать его клиентам с gzip/br
+                if message["type"] == "http.response.start" and self._eligible(Headers(raw=message["headers"]), message["status"]):
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                await send(message)
+
+            await self.app(scope, receive, send_identity)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None and not passthrough:
+                headers = Headers(raw=start_message["headers"])
+                small = not more_body and len(body) < self.minimum_size
+                if start_message["status"] == 304:
+                    passthrough = True
+                    self._mark_not_modified(MutableHeaders(raw=start_message["headers"]), request_headers.get("if-none-match", ""))
+                elif not self._eligible(headers, start_message["status"]):
+                    passthrough = True
+                elif small:
+                    passthrough = True
+                    MutableHeaders(raw=start_message["headers"]).add_vary_header("Accept-Encoding")
+                else:
+                    compressor = _Compressor(encoding)
+                    headers = MutableHeaders(raw=start_message["headers"])
+                    headers["Content-Encoding"] = encoding
+                    self._mark_encoded(headers, encoding)
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        body = compressor.compress(body) + compressor.finish()
+                        headers["Content-Length"] = str(len(body))
+                        await send(start_message)
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                await send(start_message)
+
+            if passthrough:
+                await send(message)
+                return
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,70 +1,358 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models import Mark, Person, Subject
+import os
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, or_, case, literal, Date, Integer, Numeric, String
+from datetime import date, timedelta
+from app.models import Mark, MarkRollup, Person, Subject, Group
+from app.cache import average_grade_cache, table_versions
+from app.archive import archive_horizon, include_archive, reaches_archive
 from typing import List, Dict, Any
 
-def get_average_grade(session: Session, start_date: str, end_date: str, filter_by: str) -> List[Dict[str, Any]]:
-    filter_conditions = []
-    
-    # Добавляем фильтрацию по датам
-    filter_conditions.append(Mark.created_at >= start_date)
-    filter_conditions.append(Mark.created_at <= end_date)
+
+def _parse_day(value: str) -> date:
+    # Даты приходят в формате 'YYYY-MM-DD'; время, если передано, отбрасывается
+    return date.fromisoformat(value[:10])
+
+
+# Таблицы, от которых зависит результат каждого вида отчёта: запись в любую из них инвалидирует кэш.
+# Архив входит везде - mark_rollups учитывают и его строки
+AVERAGE_GRADE_DEPENDENCIES = {
+    "students": ("marks", "marks_archive", "people"),
+    "years": ("marks", "marks_archive"),
+    "groups": ("marks", "marks_archive", "people", "groups"),
+    "teachers": ("marks", "marks_archive", "people"),
+    "subjects": ("marks", "marks_archive", "subjects"),
+}
+
+
+async def get_average_grade(session: AsyncSession, start_date: str, end_date: str, filter_by: str) -> List[Dict[str, Any]]:
+    if filter_by not in AVERAGE_GRADE_DEPENDENCIES:
+        raise ValueError("Invalid filter type")
+
+    key = (filter_by, _parse_day(start_date), _parse_day(end_date))
+    # Версии из БД снимаются до расчёта: если данные изменятся во время запроса, запись сразу окажется устаревшей
+    versions = await table_versions(session, AVERAGE_GRADE_DEPENDENCIES[filter_by])
+    result = average_grade_cache.get(key, versions)
+    if result is None:
+        result = await _calculate_average_grade(session, key[1], key[2], filter_by)
+        average_grade_cache.set(key, versions, result)
+    return result
+
+
+async def _calculate_average_grade(session: AsyncSession, start_day: date, end_day: date, filter_by: str) -> List[Dict[str, Any]]:
+    # Средние считаются по дневным агрегатам mark_rollups, а не по сырой таблице marks,
+    # поэтому стоимость отчёта зависит от числа сущностей и дней, а не от числа оценок.
+    # Диапазон включает конечный день целиком.
+    avg_grade = (func.sum(MarkRollup.value_sum).cast(Numeric) / func.sum(MarkRollup.value_count)).label('avg_grade')
+
+    def rollup_join(dimension, entity_id):
+        return and_(
+            MarkRollup.dimension == dimension,
+            MarkRollup.entity_id == entity_id,
+            MarkRollup.day >= start_day,
+            MarkRollup.day <= end_day,
+        )
 
     if filter_by == "students":
-        # Получаем всех студентов (включая тех, у кого нет оценок) и их средний балл
-        query = session.query(Person.id, Person.first_name, Person.last_name, func.avg(Mark.value).label('avg_grade'))\
-            .outerjoin(Mark, Person.id == Mark.student_id)\
-            .filter(*filter_conditions)\
+        # Средний балл каждого студента
+        statement = select(Person.id, Person.first_name, Person.last_name, avg_grade)\
+            .join(MarkRollup, rollup_join('student', Person.id))\
             .group_by(Person.id)\
-            .all()
+            .having(func.sum(MarkRollup.value_count) > 0)
+        query = (await session.execute(statement)).all()
 
-        # Возвращаем список студентов с их средним баллом
-        return [{'entity': f"{person.first_name} {person.last_name}", 'average_grade': avg_grade if avg_grade is not None else 0} 
-                for person, avg_grade in query]
+        return [{'entity': f"{first_name} {last_name}", 'average_grade': avg if avg is not None else 0}
+                for person_id, first_name, last_name, avg in query]
 
     elif filter_by == "years":
-        # Получаем средний балл по годам
-        query = session.query(func.extract('year', Mark.created_at).label('year'), func.avg(Mark.value).label('avg_grade'))\
-            .filter(*filter_conditions)\
-            .group_by(func.extract('year', Mark.created_at))\
-            .all()
+        # Средний балл по годам: все оценки дня - сумма дневных строк предметов
+        year = func.extract('year', MarkRollup.day)
+        statement = select(year.label('year'), avg_grade)\
+            .filter(MarkRollup.dimension == 'subject', MarkRollup.day >= start_day, MarkRollup.day <= end_day)\
+            .group_by(year)\
+            .having(func.sum(MarkRollup.value_count) > 0)
+        query = (await session.execute(statement)).all()
 
-        # Возвращаем средний балл для каждого года
-        return [{'entity': str(year), 'average_grade': avg_grade if avg_grade is not None else 0} for year, avg_grade in query]
+        return [{'entity': str(int(year)), 'average_grade': avg if avg is not None else 0} for year, avg in query]
 
     elif filter_by == "groups":
-        # Получаем средний балл по группам
-        query = session.query(Person.group_id, func.avg(Mark.value).label('avg_grade'))\
-            .outerjoin(Mark, Person.id == Mark.student_id)\
-            .filter(*filter_conditions)\
-            .group_by(Person.group_id)\
-            .all()
+        # Средний балл по группам: агрегаты студентов, сложенные по текущей группе студента
+        statement = select(Group.id, Group.name, avg_grade)\
+            .join(Person, Person.group_id == Group.id)\
+            .join(MarkRollup, rollup_join('student', Person.id))\
+            .group_by(Group.id, Group.name)\
+            .having(func.sum(MarkRollup.value_count) > 0)
+        query = (await session.execute(statement)).all()
 
-        # Возвращаем средний балл для каждой группы
-        return [{'entity': str(group_id), 'average_grade': avg_grade if avg_grade is not None else 0} for group_id, avg_grade in query]
+        return [{'entity': group_name, 'average_grade': avg if avg is not None else 0}
+                for group_id, group_name, avg in query]
 
     elif filter_by == "teachers":
-        # Получаем средний балл по преподавателям
-        query = session.query(Person.id, Person.first_name, Person.last_name, func.avg(Mark.value).label('avg_grade'))\
-            .outerjoin(Mark, Person.id == Mark.teacher_id)\
-            .filter(*filter_conditions)\
+        # Средний балл по преподавателям
+        statement = select(Person.id, Person.first_name, Person.last_name, avg_grade)\
+            .join(MarkRollup, rollup_join('teacher', Person.id))\
             .group_by(Person.id)\
-            .all()
+            .having(func.sum(MarkRollup.value_count) > 0)
+        query = (await session.execute(statement)).all()
 
-        # Возвращаем средний балл для каждого преподавателя
-        return [{'entity': f"{teacher.first_name} {teacher.last_name}", 'average_grade': avg_grade if avg_grade is not None else 0} 
-                for teacher, avg_grade in query]
+        return [{'entity': f"{first_name} {last_name}", 'average_grade': avg if avg is not None else 0}
+                for teacher_id, first_name, last_name, avg in query]
 
     elif filter_by == "subjects":
-        # Получаем средний балл по предметам
-        query = session.query(Subject.id, Subject.name, func.avg(Mark.value).label('avg_grade'))\
-            .outerjoin(Mark, Subject.id == Mark.subject_id)\
-            .filter(*filter_conditions)\
-            .group_by(Subject.id)\
-            .all()
+        # Средний балл по предметам
+        statement = select(Subject.id, Subject.name, avg_grade)\
+            .join(MarkRollup, rollup_join('subject', Subject.id))\
+            .group_by(Subject.id, Subject.name)\
+            .having(func.sum(MarkRollup.value_count) > 0)
+        query = (await session.execute(statement)).all()
 
-        # Возвращаем средний балл для каждого предмета
-        return [{'entity': subject.name, 'average_grade': avg_grade if avg_grade is not None else 0} for subject, avg_grade in query]
+        return [{'entity': subject_name, 'average_grade': avg if avg is not None else 0}
+                for subject_id, subject_name, avg in query]
 
     else:
         raise ValueError("Invalid filter type")
+
+
+# Таблицы, от которых зависит рейтинг при каждом виде разбиения
+RANKING_DEPENDENCIES = {
+    "group": ("marks", "marks_archive", "people", "groups"),
+    "subject": ("marks", "marks_archive", "people", "subjects"),
+    "all": ("marks", "marks_archive", "people"),
+}
+
+
+async def get_ranking(session: AsyncSession, start_date: str, end_date: str, partition_by: str, top: int | None) -> List[Dict[str, Any]]:
+    key = ("ranking", _parse_day(start_date), _parse_day(end_date), partition_by, top)
+    versions = await table_versions(session, RANKING_DEPENDENCIES[partition_by])
+    result = average_grade_cache.get(key, versions)
+    if result is None:
+        result = await _calculate_ranking(session, key[1], key[2], partition_by, top)
+        average_grade_cache.set(key, versions, result)
+    return result
+
+
+async def _calculate_ranking(session: AsyncSession, start_day: date, end_day: date, partition_by: str, top: int | None) -> List[Dict[str, Any]]:
+    # Места и процентили считаются в SQL оконными функциями по средним баллам студентов,
+    # отбор первых N в каждом разбиении тоже выполняется в БД
+    if partition_by == "subject":
+        # Дневные агрегаты не делятся по предметам, поэтому средние студента по предмету собираются
+        # из marks index-only scan'ом по (created_at, id) INCLUDE (student_id, subject_id, value):
+        # читается только диапазон дат запроса, а результат кэшируется как у остальных разбиений
+        averages = select(
+            Mark.student_id,
+            Mark.subject_id.label("partition_id"),
+            func.sum(Mark.value).label("value_sum"),
+            func.count().label("value_count"),
+        ).where(Mark.created_at >= start_day, Mark.created_at < end_day + timedelta(days=1))\
+            .group_by(Mark.student_id, Mark.subject_id)
+        if reaches_archive(await archive_horizon.get(session), start_day):
+            averages, _ = include_archive(averages)
+        averages = averages.cte("averages")
+    else:
+        # Средние студентов по дневным агрегатам mark_rollups
+        partition_id = Person.group_id if partition_by == "group" else literal(None, Integer)
+        averages = select(
+            MarkRollup.entity_id.label("student_id"),
+            partition_id.label("partition_id"),
+            func.sum(MarkRollup.value_sum).label("value_sum"),
+            func.sum(MarkRollup.value_count).label("value_count"),
+        ).join(Person, Person.id == MarkRollup.entity_id)\
+            .where(MarkRollup.dimension == 'student', MarkRollup.day >= start_day, MarkRollup.day <= end_day)\
+            .group_by(MarkRollup.entity_id, partition_id)\
+            .having(func.sum(MarkRollup.value_count) > 0).cte("averages")
+
+    average = (averages.c.value_sum.cast(Numeric) / averages.c.value_count).label("average_grade")
+    ranked = select(
+        averages.c.student_id,
+        averages.c.partition_id,
+        averages.c.value_count,
+        average,
+        func.rank().over(partition_by=averages.c.partition_id, order_by=average.desc()).label("rank"),
+        func.percent_rank().over(partition_by=averages.c.partition_id, order_by=average).label("percent_rank"),
+    ).cte("ranked")
+
+    if partition_by == "group":
+        partition_name = select(Group.name).where(Group.id == ranked.c.partition_id).scalar_subquery()
+    elif partition_by == "subject":
+        partition_name = select(Subject.name).where(Subject.id == ranked.c.partition_id).scalar_subquery()
+    else:
+        partition_name = literal(None, String)
+    statement = select(ranked, partition_name.label("partition"), Person.first_name, Person.last_name)\
+        .join(Person, Person.id == ranked.c.student_id)\
+        .order_by(ranked.c.partition_id, ranked.c.rank, ranked.c.student_id)
+    if top is not None:
+        statement = statement.where(ranked.c.rank <= top)
+    rows = (await session.execute(statement)).all()
+
+    return [{
+        'partition_id': row.partition_id,
+        'partition': row.partition,
+        'student_id': row.student_id,
+        'student': f"{row.first_name} {row.last_name}",
+        'average_grade': row.average_grade,
+        'marks_count': row.value_count,
+        'rank': row.rank,
+        'percentile': round(row.percent_rank * 100, 2),
+    } for row in rows]
+
+
+# Месяцы начала осеннего и весеннего семестров
+AUTUMN_SEMESTER_START_MONTH = int(os.getenv("AUTUMN_SEMESTER_START_MONTH", 9))
+SPRING_SEMESTER_START_MONTH = int(os.getenv("SPRING_SEMESTER_START_MONTH", 2))
+
+TREND_DEPENDENCIES = {
+    None: ("marks", "marks_archive"),
+    "group": ("marks", "marks_archive", "people", "groups"),
+    "subject": ("marks", "marks_archive", "subjects"),
+    "teacher": ("marks", "marks_archive", "people"),
+}
+
+
+def _trend_bucket(bucket: str):
+    # Начало интервала считается от дня агрегата, а не от marks.created_at
+    if bucket == "day":
+        return MarkRollup.day
+    if bucket in ("week", "month"):
+        return func.date_trunc(bucket, MarkRollup.day).cast(Date)
+    year = func.extract('year', MarkRollup.day).cast(Integer)
+    month = func.extract('month', MarkRollup.day)
+    return case(
+        (month >= AUTUMN_SEMESTER_START_MONTH, func.make_date(year, AUTUMN_SEMESTER_START_MONTH, 1)),
+        (month >= SPRING_SEMESTER_START_MONTH, func.make_date(year, SPRING_SEMESTER_START_MONTH, 1)),
+        else_=func.make_date(year - 1, AUTUMN_SEMESTER_START_MONTH, 1),
+    )
+
+
+async def get_trend(session: AsyncSession, start_date: str, end_date: str, bucket: str, split_by: str | None) -> List[Dict[str, Any]]:
+    key = ("trend", _parse_day(start_date), _parse_day(end_date), bucket, split_by)
+    versions = await table_versions(session, TREND_DEPENDENCIES[split_by])
+    result = average_grade_cache.get(key, versions)
+    if result is None:
+        result = await _calculate_trend(session, key[1], key[2], bucket, split_by)
+        average_grade_cache.set(key, versions, result)
+    return result
+
+
+async def _calculate_trend(session: AsyncSession, start_day: date, end_day: date, bucket: str, split_by: str | None) -> List[Dict[str, Any]]:
+    # Ряд строится по дневным агрегатам mark_rollups (их поддерживают триггеры на marks):
+    # график за пять лет по месяцам читает не больше 1826 дней на сущность и не трогает marks
+    period = _trend_bucket(bucket).label('bucket')
+    avg_grade = (func.sum(MarkRollup.value_sum).cast(Numeric) / func.sum(MarkRollup.value_count)).label('avg_grade')
+    marks_count = func.sum(MarkRollup.value_count).label('marks_count')
+    in_range = (MarkRollup.day >= start_day, MarkRollup.day <= end_day)
+
+    if split_by is None:
+        statement = select(period, literal(None, Integer).label('entity_id'), literal(None, String).label('entity'), avg_grade, marks_count)\
+            .where(MarkRollup.dimension == 'subject', *in_range)\
+            .group_by(period)
+    elif split_by == "group":
+        # Агрегаты студентов, сложенные по текущей группе студента
+        statement = select(period, Group.id.label('entity_id'), Group.name.label('entity'), avg_grade, marks_count)\
+            .join(Person, Person.id == MarkRollup.entity_id)\
+            .join(Group, Group.id == Person.group_id)\
+            .where(MarkRollup.dimension == 'student', *in_range)\
+            .group_by(period, Group.id, Group.name)
+    elif split_by == "subject":
+        statement = select(period, Subject.id.label('entity_id'), Subject.name.label('entity'), avg_grade, marks_count)\
+            .join(Subject, Subject.id == MarkRollup.entity_id)\
+            .where(MarkRollup.dimension == 'subject', *in_range)\
+            .group_by(period, Subject.id, Subject.name)
+    elif split_by == "teacher":
+        teacher_name = func.concat_ws(" ", Person.first_name, Person.last_name)
+        statement = select(period, Person.id.label('entity_id'), teacher_name.label('entity'), avg_grade, marks_count)\
+            .join(Person, Person.id == MarkRollup.entity_id)\
+            .where(MarkRollup.dimension == 'teacher', *in_range)\
+            .group_by(period, Person.id, Person.first_name, Person.last_name)
+    else:
+        raise ValueError("Invalid split type")
+
+    statement = statement.having(func.sum(MarkRollup.value_count) > 0).order_by('entity_id', 'bucket')
+    rows = (await session.execute(statement)).all()
+    return [{'bucket': row.bucket, 'entity_id': row.entity_id, 'entity': row.entity,
+             'average_grade': row.avg_grade, 'marks_count': row.marks_count} for row in rows]
+
+
+async def get_transcript(session: AsyncSession, student: Person) -> Dict[str, Any]:
+    # Весь транскрипт - один запрос с оконными функциями. Оценки группы читаются по индексу
+    # (student_id, created_at) INCLUDE (value), поэтому объём работы ограничен размером группы.
+    # Студент без группы ни с кем не сравнивается: group_id == None дал бы IS NULL и общий рейтинг всех таких студентов
+    grouped = student.group_id is not None
+    peers = or_(Person.id == student.id, and_(Person.group_id == student.group_id, Person.type == "S")) if grouped \
+        else Person.id == student.id
+    peer_ids = select(Person.id).where(peers)
+    peer_totals = select(
+        Mark.student_id,
+        Mark.subject_id,
+        func.sum(Mark.value).label("value_sum"),
+        func.count().label("value_count"),
+    ).where(Mark.student_id.in_(peer_ids)).group_by(Mark.student_id, Mark.subject_id).cte("peer_totals")
+
+    # Места в группе по каждому предмету
+    subject_average = (peer_totals.c.value_sum.cast(Numeric) / peer_totals.c.value_count).label("average")
+    subject_ranks = select(
+        peer_totals.c.student_id,
+        peer_totals.c.subject_id,
+        subject_average,
+        func.rank().over(partition_by=peer_totals.c.subject_id, order_by=subject_average.desc()).label("group_rank"),
+        func.count().over(partition_by=peer_totals.c.subject_id).label("group_ranked"),
+    ).cte("subject_ranks")
+
+    # Место в группе по всем предметам сразу
+    overall_average = (func.sum(peer_totals.c.value_sum).cast(Numeric) / func.sum(peer_totals.c.value_count)).label("average")
+    overall_ranks = select(
+        peer_totals.c.student_id,
+        overall_average,
+        func.rank().over(order_by=overall_average.desc()).label("group_rank"),
+        func.count().over().label("group_ranked"),
+    ).group_by(peer_totals.c.student_id).cte("overall_ranks")
+
+    order = (Mark.created_at, Mark.id)
+    statement = select(
+        Mark.id,
+        Mark.subject_id,
+        Subject.name,
+        Mark.teacher_id,
+        Mark.value,
+        Mark.created_at,
+        func.avg(Mark.value).over(partition_by=Mark.subject_id, order_by=order).label("subject_running_average"),
+        func.avg(Mark.value).over(order_by=order).label("running_average"),
+        subject_ranks.c.average,
+        subject_ranks.c.group_rank,
+        subject_ranks.c.group_ranked,
+        overall_ranks.c.average.label("overall_average"),
+        overall_ranks.c.group_rank.label("overall_rank"),
+        overall_ranks.c.group_ranked.label("overall_ranked"),
+    ).join(Subject, Subject.id == Mark.subject_id)\
+        .join(subject_ranks, and_(subject_ranks.c.student_id == Mark.student_id, subject_ranks.c.subject_id == Mark.subject_id))\
+        .join(overall_ranks, overall_ranks.c.student_id == Mark.student_id)\
+        .where(Mark.student_id == student.id)\
+        .order_by(Subject.name, Mark.subject_id, *order)
+    # У транскрипта нет диапазона дат: архив читается, если в нём есть оценки по дате или оценки этого выпускника
+    if reaches_archive(await archive_horizon.get(session), None, student.id):
+        statement, _ = include_archive(statement)
+    rows = (await session.execute(statement)).all()
+
+    transcript = {"student": student, "average": None, "group_rank": None, "group_ranked": None, "subjects": []}
+    subjects = {}
+    for row in rows:
+        if row.subject_id not in subjects:
+            subjects[row.subject_id] = {
+                "subject_id": row.subject_id,
+                "subject_name": row.name,
+                "average": row.average,
+                "group_rank": row.group_rank if grouped else None,
+                "group_ranked": row.group_ranked if grouped else None,
+                "marks": [],
+            }
+            transcript["subjects"].append(subjects[row.subject_id])
+        subjects[row.subject_id]["marks"].append({
+            "id": row.id,
+            "value": row.value,
+            "teacher_id": row.teacher_id,
+            "created_at": row.created_at,
+            "subject_running_average": row.subject_running_average,
+            "running_average": row.running_average,
+        })
+        transcript["average"] = row.overall_average
+        if grouped:
+            transcript.update(group_rank=row.overall_rank, group_ranked=row.overall_ranked)
+    return transcript
@@ -0,0 +1,45 @@
+import hashlib
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import table_versions
+from app.compression import ENCODINGS, etag_suffix
+
+# Ответ можно брать из кэша браузера, но только после проверки ETag на сервере
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Клиент присылает ETag сжатого представления - он соответствует тем же данным
+    variants = {etag} | {etag[:-1] + etag_suffix(encoding) + '"' for encoding in ENCODINGS}
+    return any(tag.strip().removeprefix("W/") in variants for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def make_etag(request: Request, state) -> str:
+    # ETag зависит от состояния данных и от параметров запроса (курсор, limit, фильтры, сортировка)
+    digest = hashlib.sha1(f"{request.url.path}?{request.url.query}|{state}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    # Заголовки кэширования ставятся и на обычный ответ; при совпадении ETag возвращается пустой 304
+    response.headers.update(cache_headers(etag))
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+
+async def check_table_etag(request: Request, response: Response, db: AsyncSession, tables: tuple) -> Response | None:
+    # Счётчики изменений таблиц (table_versions) читаются одним запросом по первичному ключу до загрузки строк.
+    # Счётчик читается раньше строк, поэтому ETag никогда не новее отданных данных
+    versions = await table_versions(db, tables)
+    state = ",".join(f"{table}={version}" for table, version in zip(tables, versions))
+    return not_modified(request, response, make_etag(request, state))
@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+from datetime import datetime
+from app.database import SessionLocal
+
+# Сколько строк забирать из серверного курсора за один раз
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def stream_rows(statement, fmt: str):
+    # Генератор открывает собственную сессию: зависимость get_db закрывается раньше,
+    # чем StreamingResponse дочитает результат
+    db = SessionLocal()
+    try:
+        # yield_per включает stream_results, поэтому psycopg2 использует серверный курсор
+        # и в памяти одновременно находится не больше одной пачки строк
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+            for batch in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(batch)
+                yield buffer.getvalue()
+        else:
+            for batch in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in batch
+                )
+    finally:
+        db.close()
@@ -0,0 +1,112 @@
+from datetime import datetime
+from fastapi import Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from app.models import Mark, Person, Subject
+from app.serialization import MARK_LIST_COLUMNS
+
+# Допустимые поля сортировки списка оценок; префикс "-" означает убывание
+MARK_SORT_FIELDS = {
+    "id": Mark.id,
+    "created_at": Mark.created_at,
+    "value": Mark.value,
+}
+
+
+def mark_created_from(created_from: datetime | None = None) -> datetime | None:
+    # Начало диапазона дат отдельно от условий WHERE: по нему решается, нужно ли читать архив
+    return created_from
+
+
+def mark_archive_filter(
+    student_id: int | None = None,
+    group_id: int | None = None,
+    created_from: datetime | None = Depends(mark_created_from),
+) -> dict:
+    # Фильтры, по которым reaches_archive решает, нужно ли читать архив
+    return {"start": created_from, "student_id": student_id, "group_id": group_id}
+
+
+def mark_filters(
+    student_id: int | None = None,
+    subject_id: int | None = None,
+    teacher_id: int | None = None,
+    group_id: int | None = None,
+    created_from: datetime | None = Depends(mark_created_from),
+    created_to: datetime | None = None,
+    min_value: int | None = None,
+    max_value: int | None = None,
+) -> list:
+    # Собираем условия WHERE, чтобы фильтрация выполнялась в БД, а не на клиенте
+    conditions = []
+    if student_id is not None:
+        conditions.append(Mark.student_id == student_id)
+    if subject_id is not None:
+        conditions.append(Mark.subject_id == subject_id)
+    if teacher_id is not None:
+        conditions.append(Mark.teacher_id == teacher_id)
+    if group_id is not None:
+        conditions.append(Mark.student_id.in_(select(Person.id).where(Person.group_id == group_id)))
+    if created_from is not None:
+        conditions.append(Mark.created_at >= created_from)
+    if created_to is not None:
+        conditions.append(Mark.created_at <= created_to)
+    if min_value is not None:
+        conditions.append(Mark.value >= min_value)
+    if max_value is not None:
+        conditions.append(Mark.value <= max_value)
+    return conditions
+
+
+def mark_sort(sort: str = Query("id", pattern="^-?(id|created_at|value)$")) -> tuple[list, bool]:
+    # Ключ сортировки всегда дополняется id, чтобы порядок был однозначным для курсора
+    descending = sort.startswith("-")
+    column = MARK_SORT_FIELDS[sort.lstrip("-")]
+    keys = [column] if column is Mark.id else [column, Mark.id]
+    return keys, descending
+
+
+Student = aliased(Person, name="student")
+Teacher = aliased(Person, name="teacher")
+
+
+def _full_name(person):
+    # ФИО собирается в SQL; concat_ws пропускает отсутствующее отчество
+    return func.concat_ws(" ", person.last_name, person.first_name, person.father_name)
+
+
+# Связанные сущности, имена которых можно встроить в список оценок:
+# (имя столбца, выражение, присоединяемая таблица, условие соединения, таблица для ETag)
+MARK_EXPANSIONS = {
+    "student": ("student_name", _full_name(Student), Student, Mark.student_id == Student.id, "people"),
+    "teacher": ("teacher_name", _full_name(Teacher), Teacher, Mark.teacher_id == Teacher.id, "people"),
+    "subject": ("subject_name", Subject.name, Subject, Mark.subject_id == Subject.id, "subjects"),
+}
+
+
+def mark_projection(fields: str | None = None, expand: str | None = None) -> tuple[list, list, tuple]:
+    # ?expand=student,teacher,subject добавляет имена через JOIN в том же запросе,
+    # ?fields=id,value,student_name оставляет в ответе только перечисленные столбцы
+    expanded = [name.strip() for name in expand.split(",") if name.strip()] if expand else []
+    unknown = [name for name in expanded if name not in MARK_EXPANSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand: {', '.join(unknown)}")
+
+    available = {name: Mark.__table__.c[name] for name in MARK_LIST_COLUMNS}
+    joins = []
+    tables = ()
+    for name in dict.fromkeys(expanded):
+        column, expression, target, onclause, table = MARK_EXPANSIONS[name]
+        available[column] = expression.label(column)
+        joins.append((target, onclause))
+        if table not in tables:
+            tables += (table,)
+
+    if fields:
+        requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        requested = list(available)
+    return [available[name] for name in requested], joins, tables
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from app.utils import pwd_context
+
+# bcrypt отпускает GIL на время хэширования, поэтому потоков достаточно для использования всех ядер.
+# Пул ограничен, чтобы массовый вход не забирал CPU и потоки у дешёвых запросов чтения
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Сколько операций может ждать или выполняться одновременно; сверх этого сразу отвечаем 503
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", PASSWORD_HASH_WORKERS * 4))
+# Сколько последних замеров хранится для перцентилей
+PASSWORD_HASH_SAMPLES = 1000
+
+
+class OperationStats:
+    def __init__(self):
+        self.completed = 0
+        self.rejected = 0
+        self.wait = deque(maxlen=PASSWORD_HASH_SAMPLES)
+        self.total = deque(maxlen=PASSWORD_HASH_SAMPLES)
+
+    def snapshot(self) -> dict:
+        def percentiles(samples):
+            values = sorted(samples)
+            if not values:
+                return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+            pick = lambda p: round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 3)
+            return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+        return {
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait": percentiles(self.wait),
+            "latency": percentiles(self.total),
+        }
+
+
+class PasswordHasher:
+    # Хэширование и проверка паролей в отдельном ограниченном пуле потоков
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"hash": OperationStats(), "verify": OperationStats()}
+
+    def _acquire(self, operation: str, count: int = 1):
+        with self._lock:
+            if self._in_flight + count > self.queue_limit:
+                self._stats[operation].rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Password hashing is busy, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += count
+
+    def _run(self, operation: str, submitted: float, release: int, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._in_flight -= release
+                stats = self._stats[operation]
+                stats.completed += 1
+                stats.wait.append(started - submitted)
+                stats.total.append(finished - submitted)
+
+    async def _submit(self, operation: str, func, *args):
+        self._acquire(operation)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, operation, time.perf_counter(), 1, func, *args)
+
+    async def hash_many(self, passwords: list, concurrency: int) -> list:
+        # Массовое хэширование занимает concurrency мест очереди на всё время работы и держит
+        # в пуле не больше concurrency задач: входы в систему идут через остальные места и потоки.
+        # Если мест нет, запрос сразу получает 503, как и одиночные операции
+        if not passwords:
+            return []
+        lanes = max(1, min(concurrency, self.workers, len(passwords)))
+        self._acquire("hash", lanes)
+        loop = asyncio.get_running_loop()
+        hashes = [None] * len(passwords)
+
+        async def lane(first: int):
+            for index in range(first, len(passwords), lanes):
+                hashes[index] = await loop.run_in_executor(
+                    self._executor, self._run, "hash", time.perf_counter(), 0, pwd_context.hash, passwords[index]
+                )
+
+        try:
+            await asyncio.gather(*(lane(first) for first in range(lanes)))
+        finally:
+            with self._lock:
+                self._in_flight -= lanes
+        return hashes
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", pwd_context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._submit("verify", pwd_context.verify, password, password_hash)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "hash": self._stats["hash"].snapshot(),
+                "verify": self._stats["verify"].snapshot(),
+            }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
@@ -1,19 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.orm import Session
-from .database import SessionLocal, engine
+from .database import engine, async_engine
 from . import models
 from . import routers
-from app.routers import groups, people, subjects, marks, analytics, user, average_grade
+from app.routers import groups, people, subjects, marks, analytics, user, average_grade, admin
 
 from app.auth import router as auth_router
+from app.pagination import NEXT_CURSOR_HEADER
+from app.compression import CompressionMiddleware
+from app.partitions import ensure_mark_partitions_if_ready, keep_mark_partitions
 from fastapi.middleware.cors import CORSMiddleware
 
 
 # Инициализация базы данных
 models.Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Секции marks на текущий и MARK_PARTITIONS_AHEAD следующих учебных лет: при запуске и затем периодически.
+    # Для запуска по расписанию без приложения есть scripts/ensure_partitions.py
+    if async_engine.dialect.name != "postgresql":
+        yield
+        return
+    async with async_engine.begin() as connection:
+        await connection.run_sync(ensure_mark_partitions_if_ready)
+    task = asyncio.create_task(keep_mark_partitions(async_engine))
+    yield
+    task.cancel()
+
+
 # Создаем приложение FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,8 +41,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Разрешить все методы (GET, POST, OPTIONS и т.д.)
     allow_headers=["*"],  # Разрешить все заголовки
+    expose_headers=[NEXT_CURSOR_HEADER],  # Курсор следующей страницы должен быть виден фронтенду
 )
 
+# Сжатие gzip/brotli для больших ответов (списки, выгрузки, отчёты)
+app.add_middleware(CompressionMiddleware)
+
 # Подключаем маршруты
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(routers.groups.router, prefix="/groups", tags=["Groups"])
@@ -32,11 +56,4 @@ app.include_router(routers.marks.router, prefix="/marks", tags=["Marks"])
 app.include_router(user.router, prefix="/users", tags=["users"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
 app.include_router(average_grade.router, prefix="/average_grade", tags=["average_grade"])
-
-# Зависимость для работы с базой данных
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
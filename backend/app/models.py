@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, CheckConstraint, DateTime
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, ForeignKey, CheckConstraint, DateTime, Date, Index, DDL, event, func
 from sqlalchemy.orm import relationship
 from .database import Base
+from .rollups import MARK_ROLLUP_FUNCTION, MARK_ROLLUP_TRIGGERS, mark_rollup_triggers
+from .table_versions import TABLE_VERSION_FUNCTION, VERSIONED_TABLES, table_version_trigger
+from .partitions import MARK_PARTITION_FUNCTION, MARK_DEFAULT_PARTITION
 from datetime import datetime
 
 
@@ -9,6 +12,7 @@ class Group(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     name = Column(String(14), unique=True, nullable=False)
+    graduated_at = Column(Date, nullable=True)  # Дата выпуска; оценки выпущенных групп переносятся в архив
 
     people = relationship("Person", back_populates="group", cascade="all, delete-orphan")  # Cascade delete for people
 
@@ -20,7 +24,7 @@ class Person(Base):
     first_name = Column(String(20), nullable=False)
     last_name = Column(String(20), nullable=False)
     father_name = Column(String(20), nullable=True)
-    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"))
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), index=True)
     type = Column(String(1), nullable=False)
 
     group = relationship("Group", back_populates="people")
@@ -42,6 +46,7 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)
     role = Column(String(10), nullable=False, default="user")  # 'user' or 'admin'
     person_id = Column(Integer, ForeignKey("people.id", ondelete="CASCADE"), nullable=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Увеличивается при изменении или отзыве доступа
 
     person = relationship("Person", back_populates="user", uselist=False, single_parent=True)  # Added single_parent=True here
 
@@ -51,6 +56,20 @@ class User(Base):
 
 
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Сессия входа: id входит в сам токен, строка обновляется при каждой ротации, а не создаётся заново
+    session_id = Column(String(32), unique=True, nullable=True)
+    token_hash = Column(String(64), unique=True, nullable=False)  # sha256 от токена; сам токен не хранится
+    token_version = Column(Integer, nullable=False)  # users.token_version на момент выдачи
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # Абсолютный срок сессии, ротация его не продлевает
+    revoked_at = Column(DateTime, nullable=True)  # Заполняется при выходе или отзыве
+
+
 class Subject(Base):
     __tablename__ = "subjects"
 
@@ -67,9 +86,89 @@ class Mark(Base):
     subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
     teacher_id = Column(Integer, ForeignKey("people.id", ondelete="CASCADE"), nullable=False)
     value = Column(Integer, nullable=False)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Поле для хранения даты и времени
+    # Ключ секционирования входит в первичный ключ таблицы (требование PostgreSQL), ORM по-прежнему идентифицирует оценку по id
+    created_at = Column(DateTime, primary_key=True, nullable=False, default=datetime.utcnow)  # Поле для хранения даты и времени
 
 
     student = relationship("Person", foreign_keys=[student_id], back_populates="received_marks")
     subject = relationship("Subject", back_populates="marks")
     teacher = relationship("Person", foreign_keys=[teacher_id], back_populates="given_marks")
+
+    __table_args__ = (
+        # Индексы под фильтры и сортировки GET /marks: равенство по ссылке + порядок keyset-пагинации
+        Index("ix_marks_student_id_id", "student_id", "id"),
+        Index("ix_marks_subject_id_id", "subject_id", "id"),
+        Index("ix_marks_teacher_id_id", "teacher_id", "id"),
+        # INCLUDE - для рейтинга по предметам: средние студентов за период считаются index-only scan'ом
+        Index("ix_marks_created_at_id", "created_at", "id", postgresql_include=["student_id", "subject_id", "value"]),
+        # Индексы под отчёты по среднему баллу: диапазон дат внутри сущности, value читается из индекса
+        Index("ix_marks_student_id_created_at", "student_id", "created_at", postgresql_include=["value"]),
+        Index("ix_marks_subject_id_created_at", "subject_id", "created_at", postgresql_include=["value"]),
+        Index("ix_marks_teacher_id_created_at", "teacher_id", "created_at", postgresql_include=["value"]),
+        # Секции по учебным годам, см. app.partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
+
+class MarkRollup(Base):
+    __tablename__ = "mark_rollups"
+
+    # 'student', 'teacher' или 'subject'; итоги за день - сумма строк 'subject'
+    dimension = Column(String(10), primary_key=True)
+    day = Column(Date, primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    value_sum = Column(BigInteger, nullable=False, default=0)
+    value_count = Column(Integer, nullable=False, default=0)
+
+
+# Секция по умолчанию и функция создания секций учебных лет (сами секции создаются при запуске, см. app.main)
+# DDL подставляет параметры через %, поэтому плейсхолдеры format() в теле функции экранируются
+event.listen(Mark.__table__, "after_create", DDL(MARK_PARTITION_FUNCTION.replace("%", "%%")).execute_if(dialect="postgresql"))
+event.listen(Mark.__table__, "after_create", DDL(MARK_DEFAULT_PARTITION).execute_if(dialect="postgresql"))
+
+# Триггеры, поддерживающие mark_rollups, создаются вместе с таблицей marks (только PostgreSQL)
+event.listen(Mark.__table__, "after_create", DDL(MARK_ROLLUP_FUNCTION).execute_if(dialect="postgresql"))
+for _trigger in MARK_ROLLUP_TRIGGERS:
+    event.listen(Mark.__table__, "after_create", DDL(_trigger).execute_if(dialect="postgresql"))
+
+
+
+class MarkArchive(Base):
+    # Исторические оценки, перенесённые из marks (см. app.archive). Только для чтения через API: PUT и DELETE /marks/{id} отвечают 409
+    __tablename__ = "marks_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    student_id = Column(Integer, ForeignKey("people.id", ondelete="CASCADE"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
+    teacher_id = Column(Integer, ForeignKey("people.id", ondelete="CASCADE"), nullable=False)
+    value = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_marks_archive_created_at_id", "created_at", "id", postgresql_include=["student_id", "subject_id", "value"]),
+        Index("ix_marks_archive_student_id_created_at", "student_id", "created_at", postgresql_include=["value"]),
+        Index("ix_marks_archive_subject_id_created_at", "subject_id", "created_at", postgresql_include=["value"]),
+        Index("ix_marks_archive_teacher_id_created_at", "teacher_id", "created_at", postgresql_include=["value"]),
+    )
+
+
+# Архив учитывается в mark_rollups теми же триггерами, что и marks
+for _trigger in mark_rollup_triggers("marks_archive"):
+    event.listen(MarkArchive.__table__, "after_create", DDL(_trigger).execute_if(dialect="postgresql"))
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(50), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)  # Сегмент счётчика, см. app.table_versions
+    version = Column(BigInteger, nullable=False, default=0)  # Увеличивается триггером при каждой записи в таблицу
+
+
+# Счётчики изменений таблиц для межпроцессной инвалидации кэшей (только PostgreSQL).
+# Функция создаётся до таблиц, чтобы триггеры можно было повесить сразу после создания каждой из них
+event.listen(Base.metadata, "before_create", DDL(TABLE_VERSION_FUNCTION.replace("%", "%%")).execute_if(dialect="postgresql"))
+for _table in VERSIONED_TABLES:
+    event.listen(Base.metadata.tables[_table], "after_create", DDL(table_version_trigger(_table)).execute_if(dialect="postgresql"))
@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Размер страницы по умолчанию и верхняя граница для параметра limit
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Заголовок, в котором возвращается курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: list) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: list) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(keys):
+            raise ValueError("cursor does not match sort keys")
+        values = []
+        for key, value in zip(keys, payload):
+            python_type = key.type.python_type
+            if python_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _keyset(statement, keys: list, cursor: str | None, limit: int, descending: bool):
+    # Keyset-пагинация: вместо OFFSET продолжаем с последнего ключа предыдущей страницы,
+    # поэтому стоимость страницы не зависит от глубины листания
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        if len(keys) == 1:
+            condition = keys[0] < values[0] if descending else keys[0] > values[0]
+        else:
+            condition = tuple_(*keys) < tuple_(*values) if descending else tuple_(*keys) > tuple_(*values)
+        statement = statement.where(condition)
+
+    order = [key.desc() if descending else key.asc() for key in keys]
+    return statement.order_by(*order).limit(limit + 1)
+
+
+async def paginate(db: AsyncSession, statement, response: Response, keys: list, cursor: str | None, limit: int, descending: bool = False):
+    rows = (await db.scalars(_keyset(statement, keys, cursor, limit, descending))).all()
+
+    # Лишняя строка говорит о том, что есть следующая страница
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, key.key) for key in keys])
+    return rows
+
+
+async def paginate_rows(db: AsyncSession, statement, response: Response, keys: list, cursor: str | None, limit: int, descending: bool = False):
+    # То же для select по столбцам: возвращает имена столбцов и кортежи без создания ORM-объектов
+    result = await db.execute(_keyset(statement, keys, cursor, limit, descending))
+    names = list(result.keys())
+    rows = result.all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last[names.index(key.key)] for key in keys])
+    return names, rows
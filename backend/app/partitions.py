@@ -0,0 +1,90 @@
+# Секционирование marks по учебным годам: секция marks_y2024 хранит оценки с 1 сентября 2024
+# по 31 августа 2025. Отчёты с диапазоном дат читают только нужные секции (partition pruning),
+# а VACUUM и обслуживание индексов касаются в основном секции текущего года.
+import asyncio
+import logging
+import os
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+ACADEMIC_YEAR_START_MONTH = 9
+# На сколько учебных лет вперёд секции создаются заранее
+MARK_PARTITIONS_AHEAD = int(os.getenv("MARK_PARTITIONS_AHEAD", 1))
+# Как часто (в секундах) работающее приложение проверяет, что секции на MARK_PARTITIONS_AHEAD лет вперёд созданы
+MARK_PARTITION_CHECK_INTERVAL = float(os.getenv("MARK_PARTITION_CHECK_INTERVAL", 24 * 3600))
+
+# Создаёт секцию учебного года, в который попадает день, если её ещё нет.
+# Оценки этого года, успевшие попасть в marks_default, переносятся в новую секцию
+MARK_PARTITION_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION marks_ensure_partition(day date) RETURNS text LANGUAGE plpgsql AS $$
+DECLARE
+    start_year int := extract(year FROM day)::int - CASE WHEN extract(month FROM day) < {ACADEMIC_YEAR_START_MONTH} THEN 1 ELSE 0 END;
+    start_day date := make_date(start_year, {ACADEMIC_YEAR_START_MONTH}, 1);
+    end_day date := make_date(start_year + 1, {ACADEMIC_YEAR_START_MONTH}, 1);
+    partition_name text := 'marks_y' || start_year;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('marks_ensure_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE marks INCLUDING DEFAULTS)', partition_name);
+    IF to_regclass('marks_default') IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM marks_default WHERE created_at >= %L AND created_at < %L RETURNING *)'
+            ' INSERT INTO %I SELECT * FROM moved',
+            start_day, end_day, partition_name
+        );
+    END IF;
+    EXECUTE format('ALTER TABLE marks ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', partition_name, start_day, end_day);
+    RETURN partition_name;
+END
+$$
+"""
+
+# Секция по умолчанию принимает оценки за годы, для которых секция ещё не создана
+MARK_DEFAULT_PARTITION = "CREATE TABLE IF NOT EXISTS marks_default PARTITION OF marks DEFAULT"
+
+
+def academic_year(day: date) -> int:
+    return day.year if day.month >= ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+
+def ensure_mark_partitions(connection, today: date | None = None, ahead: int = MARK_PARTITIONS_AHEAD) -> list:
+    # Секции на текущий и следующие учебные годы, а также на годы, чьи оценки лежат в marks_default
+    today = today or date.today()
+    current = academic_year(today)
+    years = set(range(current, current + ahead + 1))
+    years.update(int(year) for year in connection.execute(text(
+        f"SELECT DISTINCT extract(year FROM created_at - interval '{ACADEMIC_YEAR_START_MONTH - 1} months') FROM marks_default"
+    )).scalars())
+    return [
+        connection.execute(text("SELECT marks_ensure_partition(:day)"), {"day": date(year, ACADEMIC_YEAR_START_MONTH, 1)}).scalar()
+        for year in sorted(years)
+    ]
+
+
+def ensure_mark_partitions_if_ready(connection) -> list | None:
+    # До миграции 7d4b2e9f1c36 (например, при поэтапном выкате) функции и секции по умолчанию ещё нет:
+    # приложение запускается, а секции создаются при следующей проверке после миграции
+    ready = connection.execute(text(
+        "SELECT to_regproc('marks_ensure_partition') IS NOT NULL AND to_regclass('marks_default') IS NOT NULL"
+    )).scalar()
+    if not ready:
+        logger.warning("marks is not partitioned yet (migration 7d4b2e9f1c36 is not applied), partitions are not ensured")
+        return None
+    return ensure_mark_partitions(connection)
+
+
+async def keep_mark_partitions(engine: AsyncEngine, interval: float = MARK_PARTITION_CHECK_INTERVAL):
+    # Фоновая задача воркера: секция следующего учебного года появляется без перезапуска приложения.
+    # Воркеры вызывают её независимо, marks_ensure_partition сериализует их advisory-блокировкой
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with engine.begin() as connection:
+                await connection.run_sync(ensure_mark_partitions_if_ready)
+        except Exception:
+            logger.exception("Failed to ensure marks partitions")
@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models import Person, User
+from app.utils import pwd_context
+
+# Скрипт массового создания хэширует на всех ядрах (bcrypt отпускает GIL) в собственном пуле.
+# POST /users/bulk использует общий пул app.hashing и занимает в нём не больше
+# PROVISION_HASH_CONCURRENCY потоков, чтобы входы в систему продолжали обслуживаться
+PROVISION_HASH_WORKERS = int(os.getenv("PROVISION_HASH_WORKERS", os.cpu_count() or 1))
+PROVISION_HASH_CONCURRENCY = int(os.getenv("PROVISION_HASH_CONCURRENCY", max(1, (os.cpu_count() or 1) // 2)))
+PROVISION_BATCH_SIZE = 1000
+LOGIN_MAX_LENGTH = User.__table__.c.login.type.length
+ROLES = ("user", "admin")
+
+
+def hash_passwords(passwords: list, workers: int = PROVISION_HASH_WORKERS) -> list:
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provision-hash") as executor:
+        return list(executor.map(pwd_context.hash, passwords))
+
+
+def validate_rows(rows: list) -> tuple[list, list]:
+    # rows: словари с ключами login, password, person_id, role.
+    # Проверки без обращения к БД: соединение не нужно, пока идёт хэширование
+    errors = []
+    candidates = []
+    seen = set()
+    for index, row in enumerate(rows):
+        login, person_id, role = row["login"], row.get("person_id"), row.get("role") or "user"
+        if not login or len(login) > LOGIN_MAX_LENGTH:
+            errors.append({"index": index, "login": login, "detail": f"Login must be 1-{LOGIN_MAX_LENGTH} characters"})
+        elif login in seen:
+            errors.append({"index": index, "login": login, "detail": "Duplicate login in request"})
+        elif not row.get("password"):
+            errors.append({"index": index, "login": login, "detail": "Password is required"})
+        elif role not in ROLES:
+            errors.append({"index": index, "login": login, "detail": f"Role must be one of {', '.join(ROLES)}"})
+        else:
+            candidates.append((index, {"login": login, "password": row["password"], "person_id": person_id, "role": role}))
+        seen.add(login)
+    return errors, candidates
+
+
+def insert_users(db: Session, candidates: list, hashes: list, errors: list) -> dict:
+    # Проверки по БД выполняются уже после хэширования, чтобы транзакция не простаивала открытой
+    person_ids = {row["person_id"] for _, row in candidates if row["person_id"] is not None}
+    existing_people = set(db.scalars(select(Person.id).where(Person.id.in_(person_ids))).all())
+    ready = []
+    for (index, row), password_hash in zip(candidates, hashes):
+        if row["person_id"] is not None and row["person_id"] not in existing_people:
+            errors.append({"index": index, "login": row["login"], "detail": f"Person {row['person_id']} not found"})
+        else:
+            ready.append((index, row, password_hash))
+
+    created = {}
+    for start in range(0, len(ready), PROVISION_BATCH_SIZE):
+        batch = ready[start:start + PROVISION_BATCH_SIZE]
+        values = [
+            {"login": row["login"], "password_hash": password_hash, "role": row["role"], "person_id": row["person_id"]}
+            for _, row, password_hash in batch
+        ]
+        # Занятые логины (в том числе занятые параллельным запросом) пропускаются, а не обрывают пакет
+        statement = insert(User).values(values).on_conflict_do_nothing(index_elements=[User.login])\
+            .returning(User.id, User.login)
+        inserted = dict((login, user_id) for user_id, login in db.execute(statement).all())
+        for index, row, _ in batch:
+            if row["login"] in inserted:
+                created[index] = inserted[row["login"]]
+            else:
+                errors.append({"index": index, "login": row["login"], "detail": "Login already registered"})
+    db.commit()
+
+    errors.sort(key=lambda error: error["index"])
+    return {"created": len(created), "ids": [created[index] for index in sorted(created)], "errors": errors}
+
+
+def provision_users(db: Session, rows: list, workers: int = PROVISION_HASH_WORKERS) -> dict:
+    # Для scripts/provision_users.py: отдельный процесс хэширует на собственном пуле потоков.
+    # Пароли хэшируются только для строк, прошедших проверку
+    errors, candidates = validate_rows(rows)
+    hashes = hash_passwords([row["password"] for _, row in candidates], workers)
+    return insert_users(db, candidates, hashes, errors)
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import time
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import data_versions
+from app.models import Group, Subject, TableVersion
+from app.schemas import GroupRead, SubjectRead
+from app.etags import cache_headers, etag_matches, make_etag
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+# Как часто (в секундах) воркер сверяет счётчик таблицы в table_versions.
+# Запись через этот же процесс видна сразу; запись через другой воркер - не позже чем через интервал
+REFERENCE_CACHE_POLL_INTERVAL = float(os.getenv("REFERENCE_CACHE_POLL_INTERVAL", 1))
+
+
+class ReferenceCache:
+    # Копия небольшой справочной таблицы в памяти процесса: строки отсортированы по id
+    # и уже сериализованы в JSON, ответ собирается склейкой байтов без обращения к БД
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+        self.table = model.__tablename__
+        self._key = None
+        self._ids = []
+        self._rows = []
+        self._full = b"[]"
+        self._digest = ""
+        self._db_version = None
+        self._polled_at = 0.0
+        self.hits = 0
+        self.reloads = 0
+
+    async def _version(self, db: AsyncSession):
+        now = time.monotonic()
+        if self._db_version is None or now - self._polled_at >= REFERENCE_CACHE_POLL_INTERVAL:
+            statement = select(func.sum(TableVersion.version)).where(TableVersion.table_name == self.table)
+            self._db_version = (await db.scalar(statement)) or 0
+            self._polled_at = now
+        return (data_versions.snapshot((self.table,)), self._db_version)
+
+    async def _load(self, db: AsyncSession, key):
+        rows = (await db.scalars(select(self.model).order_by(self.model.id))).all()
+        self._ids = [row.id for row in rows]
+        self._rows = [self.schema.model_validate(row, from_attributes=True).model_dump_json().encode() for row in rows]
+        self._full = b"[" + b",".join(self._rows) + b"]"
+        # ETag считается от содержимого, поэтому совпадает у всех воркеров с одинаковыми данными
+        self._digest = hashlib.sha1(self._full).hexdigest()
+        self._key = key
+        self.reloads += 1
+
+    async def page(self, request: Request, db: AsyncSession, cursor: str | None, limit: int) -> Response:
+        key = await self._version(db)
+        if key != self._key:
+            await self._load(db, key)
+        else:
+            self.hits += 1
+
+        etag = make_etag(request, self._digest)
+        headers = cache_headers(etag)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        start = 0
+        if cursor:
+            # Тот же формат курсора, что и у paginate: id последней строки предыдущей страницы
+            last_id = decode_cursor(cursor, [self.model.id])[0]
+            start = next((i for i, row_id in enumerate(self._ids) if row_id > last_id), len(self._ids))
+        end = start + limit
+
+        if end < len(self._ids):
+            headers[NEXT_CURSOR_HEADER] = encode_cursor([self._ids[end - 1]])
+        body = self._full if start == 0 and end >= len(self._ids) else b"[" + b",".join(self._rows[start:end]) + b"]"
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {"rows": len(self._ids), "hits": self.hits, "reloads": self.reloads}
+
+
+groups_cache = ReferenceCache(Group, GroupRead)
+subjects_cache = ReferenceCache(Subject, SubjectRead)
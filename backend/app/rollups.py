@@ -0,0 +1,61 @@
+# Поддержка таблицы mark_rollups: суммы и количества оценок по (измерение, день, сущность).
+# Таблица обновляется триггерами на marks уровня оператора, поэтому её учитывают
+# все пути записи, включая каскадные удаления и массовую загрузку.
+
+# Вклад набора строк marks в агрегаты: каждая оценка попадает в три измерения.
+# Общей строки за день нет - её обновлял бы каждый оператор записи, и все транзакции с оценками
+# ждали бы друг друга до commit; итоги за день складываются из строк 'subject' при чтении.
+# Строки обновляются в порядке первичного ключа, чтобы параллельные пакеты не блокировали друг друга крест-накрест
+_ROLLUP_UPSERT = """
+        INSERT INTO mark_rollups (dimension, day, entity_id, value_sum, value_count)
+        SELECT d.dimension, r.created_at::date, d.entity_id, sum(r.sign * r.value), sum(r.sign)
+        FROM ({rows}) r
+        CROSS JOIN LATERAL (VALUES
+            ('student', r.student_id),
+            ('teacher', r.teacher_id),
+            ('subject', r.subject_id)
+        ) AS d(dimension, entity_id)
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (dimension, day, entity_id) DO UPDATE
+        SET value_sum = mark_rollups.value_sum + EXCLUDED.value_sum,
+            value_count = mark_rollups.value_count + EXCLUDED.value_count;
+"""
+
+_NEW_ROWS = "SELECT student_id, teacher_id, subject_id, created_at, value, 1 AS sign FROM new_rows"
+_OLD_ROWS = "SELECT student_id, teacher_id, subject_id, created_at, value, -1 AS sign FROM old_rows"
+
+MARK_ROLLUP_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION marks_rollup_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+{_ROLLUP_UPSERT.format(rows=_NEW_ROWS)}
+    ELSIF TG_OP = 'UPDATE' THEN
+{_ROLLUP_UPSERT.format(rows=_NEW_ROWS + " UNION ALL " + _OLD_ROWS)}
+    ELSE
+{_ROLLUP_UPSERT.format(rows=_OLD_ROWS)}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+# Переходные таблицы нельзя объявить у триггера на несколько событий, поэтому триггеров три.
+# Те же триггеры висят на marks_archive: перенос оценки в архив в сумме не меняет агрегатов
+def mark_rollup_triggers(table: str) -> list:
+    return [
+        f"CREATE TRIGGER {table}_rollup_insert AFTER INSERT ON {table}"
+        " REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()",
+        f"CREATE TRIGGER {table}_rollup_update AFTER UPDATE ON {table}"
+        " REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()",
+        f"CREATE TRIGGER {table}_rollup_delete AFTER DELETE ON {table}"
+        " REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION marks_rollup_apply()",
+    ]
+
+
+MARK_ROLLUP_TRIGGERS = mark_rollup_triggers("marks")
+
+# Первичное заполнение по уже существующим оценкам
+MARK_ROLLUP_BACKFILL = _ROLLUP_UPSERT.format(
+    rows="SELECT student_id, teacher_id, subject_id, created_at, value, 1 AS sign FROM marks"
+)
@@ -0,0 +1,106 @@
+import csv
+import psycopg2
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+ROSTER_COLUMNS = ("first_name", "last_name", "father_name", "group_name", "type")
+REQUIRED_COLUMNS = {"first_name", "last_name", "type"}
+
+
+def _read_header(stream) -> list[str]:
+    header = stream.readline()
+    if isinstance(header, bytes):
+        header = header.decode("utf-8-sig")
+    columns = [c.strip().lower() for c in next(csv.reader([header]), [])]
+    # В файлах из деканата колонка группы обычно называется просто "group"
+    columns = ["group_name" if c == "group" else c for c in columns]
+
+    unknown = set(columns) - set(ROSTER_COLUMNS)
+    missing = REQUIRED_COLUMNS - set(columns)
+    if unknown or missing or len(set(columns)) != len(columns):
+        raise ValueError(
+            f"Invalid CSV header: expected columns {', '.join(ROSTER_COLUMNS)} "
+            f"(required: {', '.join(sorted(REQUIRED_COLUMNS))})"
+        )
+    return columns
+
+
+def import_roster(db: Session, stream) -> dict:
+    columns = _read_header(stream)
+
+    # Файл целиком загружается через COPY во временную таблицу, дальше всё делается
+    # несколькими set-based запросами вместо INSERT на каждую строку
+    db.execute(text(
+        "CREATE TEMP TABLE roster_staging ("
+        " line serial, first_name text, last_name text, father_name text, group_name text, type text"
+        ") ON COMMIT DROP"
+    ))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY roster_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            stream,
+        )
+    except psycopg2.DataError as e:
+        db.rollback()
+        raise ValueError(f"Malformed CSV: {(e.pgerror or str(e)).strip()}")
+    finally:
+        cursor.close()
+
+    total = db.execute(text("SELECT count(*) FROM roster_staging")).scalar()
+
+    db.execute(text(
+        "UPDATE roster_staging SET"
+        " first_name = nullif(btrim(first_name), ''),"
+        " last_name = nullif(btrim(last_name), ''),"
+        " father_name = nullif(btrim(father_name), ''),"
+        " group_name = nullif(btrim(group_name), ''),"
+        " type = upper(btrim(type))"
+    ))
+
+    # Строки, которые не пройдут ограничения таблиц people/groups, отбрасываем и сообщаем их номера
+    rejected = db.execute(text(
+        "DELETE FROM roster_staging"
+        " WHERE first_name IS NULL OR last_name IS NULL"
+        " OR length(first_name) > 20 OR length(last_name) > 20 OR length(father_name) > 20"
+        " OR length(group_name) > 14"
+        " OR type IS NULL OR type NOT IN ('S', 'P')"
+        " RETURNING line"
+    )).scalars().all()
+
+    # Все недостающие группы создаются одним запросом
+    groups_created = db.execute(text(
+        "WITH created AS ("
+        " INSERT INTO groups (name)"
+        " SELECT DISTINCT group_name FROM roster_staging WHERE group_name IS NOT NULL"
+        " ON CONFLICT (name) DO NOTHING RETURNING id"
+        ") SELECT count(*) FROM created"
+    )).scalar()
+
+    # У people нет естественного ключа, поэтому "upsert" вставляет только тех,
+    # кого ещё нет с тем же ФИО, группой и типом; coalesce оставляет соединение хешируемым
+    people_created = db.execute(text(
+        "WITH created AS ("
+        " INSERT INTO people (first_name, last_name, father_name, group_id, type)"
+        " SELECT DISTINCT s.first_name, s.last_name, s.father_name, g.id, s.type"
+        " FROM roster_staging s LEFT JOIN groups g ON g.name = s.group_name"
+        " WHERE NOT EXISTS ("
+        "  SELECT 1 FROM people p"
+        "  WHERE p.first_name = s.first_name AND p.last_name = s.last_name"
+        "  AND coalesce(p.father_name, '') = coalesce(s.father_name, '')"
+        "  AND coalesce(p.group_id, 0) = coalesce(g.id, 0)"
+        "  AND p.type = s.type"
+        " ) RETURNING id"
+        ") SELECT count(*) FROM created"
+    )).scalar()
+
+    db.commit()
+
+    return {
+        "rows": total,
+        "groups_created": groups_created,
+        "people_created": people_created,
+        "people_skipped": total - len(rejected) - people_created,
+        # Номера строк в файле с учётом заголовка
+        "rejected_lines": sorted(line + 1 for line in rejected),
+    }
@@ -0,0 +1,69 @@
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from app.database import get_db, engine, async_engine, pool_status, DB_POOL_TIMEOUT, DB_POOL_PRE_PING, DB_POOL_RECYCLE
+from app.models import User
+from app.auth import get_current_user
+from app.hashing import password_hasher
+from app.reference import groups_cache, subjects_cache
+from app.archive import MARK_ARCHIVE_BATCH_SIZE, archive_horizon, archive_marks
+
+router = APIRouter()
+
+# Проверка роли администратора
+def is_admin(user: User):
+    return user.role == "admin"
+
+@router.get("/db-pool")
+def db_pool_metrics(current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+    # Показатели относятся к текущему процессу: при нескольких воркерах uvicorn у каждого свои пулы
+    return {
+        "pid": os.getpid(),
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "sync": pool_status(engine.pool),
+        "async": pool_status(async_engine.pool),
+    }
+
+@router.get("/password-hashing")
+def password_hashing_metrics(current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+    # Очередь и задержки пула хэширования паролей в текущем процессе
+    return password_hasher.stats()
+
+@router.get("/reference-cache")
+def reference_cache_metrics(current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+    return {"groups": groups_cache.stats(), "subjects": subjects_cache.stats()}
+
+@router.post("/archive-marks")
+def archive_old_marks(
+    before: datetime | None = None,
+    batch_size: int = Query(MARK_ARCHIVE_BATCH_SIZE, ge=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+    # То же, что scripts/archive_marks.py; другие воркеры увидят новый архив через table_versions
+    report = archive_marks(db, before, batch_size)
+    archive_horizon.invalidate()
+    return report
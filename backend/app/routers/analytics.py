@@ -1,88 +1,153 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from datetime import datetime
-from app.database import SessionLocal
-from sqlalchemy import func
-from app.models import Group, Person, Subject, Mark
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, timedelta
+from app.database import get_async_db
+from sqlalchemy import select, func, literal, tuple_
+from app.models import Group, Person, Subject, Mark, User
+from app.schemas import AnalyticsRequest
+from app.auth import get_current_user
+from app.archive import archive_horizon, include_archive, reaches_archive
 
 
 router = APIRouter()
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+Student = aliased(Person)
+Teacher = aliased(Person)
+
+# Измерения в фиксированном порядке; первый столбец каждого измерения - его ключ
+DIMENSIONS = ("group", "student", "subject", "teacher")
+DIMENSION_COLUMNS = {
+    "group": (Group.id.label("group_id"), Group.name.label("group_name")),
+    "student": (Student.id.label("student_id"), Student.first_name.label("student_first_name"), Student.last_name.label("student_last_name")),
+    "subject": (Subject.id.label("subject_id"), Subject.name.label("subject_name")),
+    "teacher": (Teacher.id.label("teacher_id"), Teacher.first_name.label("teacher_first_name"), Teacher.last_name.label("teacher_last_name")),
+}
+
+
+def _grouping_mask(dimensions: tuple, used: list) -> int:
+    # GROUPING(a, b, ...) ставит 1 в бит измерения, по которому строка свёрнута; старший бит - первое измерение
+    mask = 0
+    for i, name in enumerate(used):
+        if name not in dimensions:
+            mask |= 1 << (len(used) - 1 - i)
+    return mask
+
+
+def _format_row(row, dimensions: tuple) -> dict:
+    item = {}
+    if "group" in dimensions:
+        item["group_id"] = row.group_id
+        item["group"] = row.group_name
+    if "student" in dimensions:
+        item["student_id"] = row.student_id
+        item["student"] = f"{row.student_first_name} {row.student_last_name}"
+    if "subject" in dimensions:
+        item["subject_id"] = row.subject_id
+        item["subject"] = row.subject_name
+    if "teacher" in dimensions:
+        item["teacher_id"] = row.teacher_id
+        item["teacher"] = f"{row.teacher_first_name} {row.teacher_last_name}"
+    item["average_grade"] = round(float(row.average_grade), 2)
+    item["marks_count"] = row.marks_count
+    return item
+
+
+def _chart_label(item: dict) -> str:
+    names = [item[name] for name in DIMENSIONS if name in item and item[name] is not None]
+    return " / ".join(str(name) for name in names) or "Total"
+
+
 @router.post("/analytics")
-def analytics(
-    date_range: list[str] | None = None,
-    student: int | None = None,
-    group: int | None = None,
-    subject: int | None = None,
-    teacher: int | None = None,
-    db: Session = Depends(get_db),
+async def analytics(
+    request: AnalyticsRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
 ):
-    # Базовый запрос к таблице оценок
-    query = db.query(
+    # Нормализуем порядок измерений и убираем повторяющиеся наборы группировки
+    groupings = []
+    for grouping in request.groupings:
+        dimensions = tuple(name for name in DIMENSIONS if name in grouping)
+        if dimensions not in groupings:
+            groupings.append(dimensions)
+    if () not in groupings:
+        groupings.append(())  # Общий итог считается тем же проходом
+
+    # В SELECT и GROUPING() могут входить только столбцы, встречающиеся в каком-либо наборе
+    used = [name for name in DIMENSIONS if any(name in dimensions for dimensions in groupings)]
+    grouping_sets = [
+        tuple_(*[column.element for name in dimensions for column in DIMENSION_COLUMNS[name]])
+        for dimensions in groupings
+    ]
+    if used:
+        grouping_mask = func.grouping(*[DIMENSION_COLUMNS[name][0].element for name in used])
+    else:
+        grouping_mask = literal(0)
+
+    query = select(
+        *[column for name in used for column in DIMENSION_COLUMNS[name]],
         func.avg(Mark.value).label("average_grade"),
-        Group.name.label("group"),
-        Person.first_name.label("student_first_name"),
-        Person.last_name.label("student_last_name"),
-        Subject.name.label("subject"),
-        Person.first_name.label("teacher_first_name"),
-        Person.last_name.label("teacher_last_name"),
-    ).join(
-        Group, Mark.group_id == Group.id
-    ).join(
-        Person, Mark.student_id == Person.id
-    ).join(
-        Subject, Mark.subject_id == Subject.id
-    ).join(
-        Person, Mark.teacher_id == Person.id
-    )
+        func.count(Mark.id).label("marks_count"),
+        grouping_mask.label("grouping_mask"),
+    ).select_from(Mark)\
+        .join(Student, Mark.student_id == Student.id)\
+        .outerjoin(Group, Student.group_id == Group.id)\
+        .join(Subject, Mark.subject_id == Subject.id)\
+        .join(Teacher, Mark.teacher_id == Teacher.id)
 
     # Применение фильтров
-    if date_range:
-        start_date = datetime.strptime(date_range[0], "%Y-%m-%d")
-        end_date = datetime.strptime(date_range[1], "%Y-%m-%d")
-        query = query.filter(Mark.date.between(start_date, end_date))
-
-    if student:
-        query = query.filter(Mark.student_id == student)
-
-    if group:
-        query = query.filter(Mark.group_id == group)
-
-    if subject:
-        query = query.filter(Mark.subject_id == subject)
-
-    if teacher:
-        query = query.filter(Mark.teacher_id == teacher)
-
-    # Выполнение запроса
-    results = query.group_by(
-        Group.name, Person.id, Subject.id, Person.id
-    ).all()
-
-    # Форматирование данных
-    table_data = [
-        {
-            "group": result.group,
-            "student": f"{result.student_first_name} {result.student_last_name}",
-            "subject": result.subject,
-            "teacher": f"{result.teacher_first_name} {result.teacher_last_name}",
-            "average_grade": round(result.average_grade, 2),
-        }
-        for result in results
-    ]
+    try:
+        if request.start_date:
+            query = query.filter(Mark.created_at >= date.fromisoformat(request.start_date[:10]))
+        if request.end_date:
+            query = query.filter(Mark.created_at < date.fromisoformat(request.end_date[:10]) + timedelta(days=1))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in 'YYYY-MM-DD' format")
+
+    if request.student_id is not None:
+        query = query.filter(Mark.student_id == request.student_id)
+
+    if request.group_id is not None:
+        query = query.filter(Student.group_id == request.group_id)
+
+    if request.subject_id is not None:
+        query = query.filter(Mark.subject_id == request.subject_id)
+
+    if request.teacher_id is not None:
+        query = query.filter(Mark.teacher_id == request.teacher_id)
+
+    query = query.group_by(func.grouping_sets(*grouping_sets))
+    start = date.fromisoformat(request.start_date[:10]) if request.start_date else None
+    if reaches_archive(await archive_horizon.get(db), start, request.student_id, request.group_id):
+        query, _ = include_archive(query)
+
+    # Все наборы группировки считаются одним запросом через GROUPING SETS
+    results = (await db.execute(query)).all()
+
+    masks = {_grouping_mask(dimensions, used): dimensions for dimensions in groupings}
+    grouped = {",".join(dimensions): [] for dimensions in groupings if dimensions}
+    total = {"average_grade": None, "marks_count": 0}
+    for row in results:
+        dimensions = masks[row.grouping_mask]
+        if not dimensions:
+            if row.marks_count:
+                total = {"average_grade": round(float(row.average_grade), 2), "marks_count": row.marks_count}
+        else:
+            grouped[",".join(dimensions)].append(_format_row(row, dimensions))
+
+    for rows in grouped.values():
+        rows.sort(key=_chart_label)
+
+    # Таблица и график строятся по первому запрошенному набору группировки
+    first = groupings[0]
+    table_data = grouped[",".join(first)] if first else [total]
 
-    # Данные для графика
     chart_data = {
-        "labels": [f"{res.subject} ({res.group})" for res in results],
+        "labels": [_chart_label(item) for item in table_data],
         "datasets": [
             {
                 "label": "Average Grades",
-                "data": [res.average_grade for res in results],
+                "data": [item["average_grade"] for item in table_data],
                 "backgroundColor": "rgba(75, 192, 192, 0.2)",
                 "borderColor": "rgba(75, 192, 192, 1)",
                 "borderWidth": 1,
@@ -90,4 +155,4 @@ def analytics(
         ],
     }
 
-    return {"table": table_data, "chart": chart_data}
+    return {"table": table_data, "chart": chart_data, "groupings": grouped, "total": total}
@@ -1,19 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
 from app.models import Group, User
 from app.schemas import GroupCreate, GroupRead, GroupUpdate
+from app.cache import data_versions
 from app.auth import get_current_user
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.reference import groups_cache
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def admin_only(user: User):
     if user.role != "admin":
         raise HTTPException(
@@ -22,14 +19,15 @@ def admin_only(user: User):
         )
 
 @router.get("/", response_model=list[GroupRead])
-def read_groups(
-    skip: int = 0,
-    limit: int = 100000,
-    db: Session = Depends(get_db),
+async def read_groups(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)  # Проверка на авторизацию
 ):
-    # Все пользователи могут видеть список групп
-    return db.query(Group).offset(skip).limit(limit).all()
+    # Все пользователи могут видеть список групп; ответ отдаётся из кэша справочника (app.reference)
+    return await groups_cache.page(request, db, cursor, limit)
 
 @router.post("/", response_model=GroupRead)
 def create_group(
@@ -39,9 +37,10 @@ def create_group(
 ):
     # Только администратор может создавать группы
     admin_only(current_user)
-    db_group = Group(name=group.name)
+    db_group = Group(name=group.name, graduated_at=group.graduated_at)
     db.add(db_group)
     db.commit()
+    data_versions.bump("groups")
     db.refresh(db_group)
     return db_group
 
@@ -58,6 +57,7 @@ def delete_group(
         raise HTTPException(status_code=404, detail="Group not found")
     db.delete(db_group)
     db.commit()
+    data_versions.bump("groups", "users")
     return db_group
 
 @router.put("/{group_id}", response_model=GroupRead)
@@ -75,7 +75,11 @@ def update_group(
     
     # Обновляем поля в группе
     db_group.name = group.name
+    # Дата выпуска меняется, только если передана явно: форма переименования её не отправляет
+    if "graduated_at" in group.model_fields_set:
+        db_group.graduated_at = group.graduated_at
     db.add(db_group)
     db.commit()
+    data_versions.bump("groups")
     db.refresh(db_group)
     return db_group
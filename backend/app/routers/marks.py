@@ -1,29 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from datetime import datetime  # Добавьте этот импорт в начало файла
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app.models import Mark
-from app.schemas import MarkCreate, MarkRead
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
+from app.models import Mark, MarkArchive, Person, Subject
+from app.schemas import MarkCreate, MarkRead, MarkBulkCreate, MarkBulkResult
 from app.auth import get_current_user  # Импортируем функцию для получения текущего пользователя
 from app.models import User  # Импортируем модель пользователя для проверки роли
+from app.etags import check_table_etag
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_rows
+from app.serialization import json_response, list_format, list_responses, rows_json
+from app.filters import mark_archive_filter, mark_filters, mark_projection, mark_sort
+from app.export import EXPORT_MEDIA_TYPES, stream_rows
+from app.archive import archive_horizon, include_archive, reaches_archive
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Допустимый диапазон значений оценки для массовой загрузки
+MIN_MARK_VALUE = int(os.getenv("MIN_MARK_VALUE", 2))
+MAX_MARK_VALUE = int(os.getenv("MAX_MARK_VALUE", 5))
 
 # Функция для проверки, является ли пользователь администратором
 def is_admin(user: User):
     return user.role == "admin"
 
-@router.get("/", response_model=list[MarkRead])
-def read_marks(skip: int = 0, limit: int = 100000, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def reference_error(mark, person_types: dict, existing_subjects: set) -> tuple[int, str] | None:
+    # Отсутствующая ссылка - 404, человек не той роли - 400, чтобы клиент мог их различить
+    for person_id, expected, role in ((mark.student_id, "S", "student"), (mark.teacher_id, "P", "teacher")):
+        if person_id not in person_types:
+            return 404, f"{role.capitalize()} {person_id} not found"
+        if person_types[person_id] != expected:
+            return 400, f"Person {person_id} is not a {role}"
+    if mark.subject_id not in existing_subjects:
+        return 404, f"Subject {mark.subject_id} not found"
+    return None
+
+def check_references(db: Session, mark: MarkCreate):
+    person_types = dict(db.execute(
+        select(Person.id, Person.type).where(Person.id.in_((mark.student_id, mark.teacher_id)))
+    ).all())
+    existing_subjects = set(db.scalars(select(Subject.id).where(Subject.id == mark.subject_id)).all())
+    error = reference_error(mark, person_types, existing_subjects)
+    if error:
+        raise HTTPException(status_code=error[0], detail=error[1])
+
+@router.get("/", responses=list_responses(
+    MarkRead,
+    "format=objects (default): array of marks; format=columns: object with one array per field. "
+    "Only the fields chosen by ?fields are present (by default the MarkRead fields), "
+    "?expand adds student_name, teacher_name and subject_name. The next page is given by the X-Next-Cursor header",
+))
+async def read_marks(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    filters: list = Depends(mark_filters),
+    archive_filter: dict = Depends(mark_archive_filter),
+    sort: tuple[list, bool] = Depends(mark_sort),
+    projection: tuple[list, list, tuple] = Depends(mark_projection),
+    format: str = Depends(list_format),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
     # Пользователи могут только читать оценки
-    return db.query(Mark).offset(skip).limit(limit).all()
+    columns, joins, tables = projection
+    # Фильтр по группе читает people, поэтому ETag зависит и от этой таблицы
+    cached = await check_table_etag(request, response, db, ("marks", "marks_archive", "people") + tables)
+    if cached:
+        return cached
+    keys, descending = sort
+    # Ключи сортировки нужны для курсора, даже если их нет в ?fields - они выбираются последними и отрезаются
+    selected = {column.key for column in columns}
+    hidden = [key for key in keys if key.key not in selected]
+    # Столбцы читаются кортежами и сразу сериализуются в JSON, минуя ORM и MarkRead
+    statement = select(*columns, *hidden).select_from(Mark)
+    for target, onclause in joins:
+        statement = statement.join(target, onclause)
+    statement = statement.where(*filters)
+    # Архив читается, только если диапазон дат, студент или группа запроса до него доходят
+    if reaches_archive(await archive_horizon.get(db), **archive_filter):
+        statement, keys = include_archive(statement, keys)
+    names, rows = await paginate_rows(db, statement, response, keys, cursor, limit, descending)
+    if hidden:
+        names, rows = names[:len(columns)], [row[:len(columns)] for row in rows]
+    return json_response(rows_json(names, rows, format), response)
+
+@router.get("/export")
+def export_marks(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    filters: list = Depends(mark_filters),
+    archive_filter: dict = Depends(mark_archive_filter),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Выгрузка отдаётся потоком: строки читаются из БД пачками и сразу отправляются клиенту
+    statement = select(
+        Mark.id, Mark.student_id, Mark.subject_id, Mark.teacher_id, Mark.value, Mark.created_at
+    ).where(*filters).order_by(Mark.id)
+    if reaches_archive(archive_horizon.get_sync(db), **archive_filter):
+        statement, _ = include_archive(statement)
+    return StreamingResponse(
+        stream_rows(statement, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=marks.{format}"},
+    )
 
 @router.post("/", response_model=MarkRead)
 def create_mark(mark: MarkCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -33,6 +117,8 @@ def create_mark(mark: MarkCreate, db: Session = Depends(get_db), current_user: U
             detail="You do not have permission to perform this action"
         )
     
+    check_references(db, mark)
+
     # Если дата не передана, она будет установлена на сервере
     if not mark.created_at:
         mark.created_at = datetime.utcnow()
@@ -50,6 +136,52 @@ def create_mark(mark: MarkCreate, db: Session = Depends(get_db), current_user: U
     db.refresh(db_mark)
     return db_mark
 
+@router.post("/bulk", response_model=MarkBulkResult)
+def create_marks_bulk(payload: MarkBulkCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+
+    # Проверяем все ссылки двумя запросами на весь пакет, а не по запросу на строку
+    person_ids = {m.student_id for m in payload.marks} | {m.teacher_id for m in payload.marks}
+    subject_ids = {m.subject_id for m in payload.marks}
+    person_types = dict(db.execute(select(Person.id, Person.type).where(Person.id.in_(person_ids))).all())
+    existing_subjects = set(db.scalars(select(Subject.id).where(Subject.id.in_(subject_ids))).all())
+
+    now = datetime.utcnow()
+    rows = []
+    errors = []
+    for index, mark in enumerate(payload.marks):
+        error = reference_error(mark, person_types, existing_subjects)
+        if error:
+            errors.append({"index": index, "detail": error[1]})
+        elif not MIN_MARK_VALUE <= mark.value <= MAX_MARK_VALUE:
+            errors.append({"index": index, "detail": f"Value must be between {MIN_MARK_VALUE} and {MAX_MARK_VALUE}"})
+        else:
+            rows.append({
+                "student_id": mark.student_id,
+                "subject_id": mark.subject_id,
+                "teacher_id": mark.teacher_id,
+                "value": mark.value,
+                "created_at": mark.created_at or now,
+            })
+
+    # Одна транзакция: executemany с insertmanyvalues превращается в многострочные INSERT ... VALUES
+    ids = []
+    if rows:
+        ids = db.scalars(insert(Mark).returning(Mark.id, sort_by_parameter_order=True), rows).all()
+        db.commit()
+
+    return {"inserted": len(ids), "ids": ids, "errors": errors}
+
+def raise_mark_not_found(db: Session, mark_id: int):
+    # Архивные оценки (marks_archive) через API не меняются и не удаляются: вместо 404 сообщаем, что оценка в архиве
+    if db.query(MarkArchive.id).filter(MarkArchive.id == mark_id).first() is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Mark {mark_id} is archived and read-only")
+    raise HTTPException(status_code=404, detail="Mark not found")
+
 @router.delete("/{mark_id}", response_model=MarkRead)
 def delete_mark(mark_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     if not is_admin(current_user):
@@ -59,7 +191,7 @@ def delete_mark(mark_id: int, db: Session = Depends(get_db), current_user: User
         )
     db_mark = db.query(Mark).filter(Mark.id == mark_id).first()
     if db_mark is None:
-        raise HTTPException(status_code=404, detail="Mark not found")
+        raise_mark_not_found(db, mark_id)
     db.delete(db_mark)
     db.commit()
     return db_mark
@@ -74,7 +206,8 @@ def update_mark(mark_id: int, mark: MarkCreate, db: Session = Depends(get_db), c
     
     db_mark = db.query(Mark).filter(Mark.id == mark_id).first()
     if db_mark is None:
-        raise HTTPException(status_code=404, detail="Mark not found")
+        raise_mark_not_found(db, mark_id)
+    check_references(db, mark)
 
     db_mark.student_id = mark.student_id
     db_mark.subject_id = mark.subject_id
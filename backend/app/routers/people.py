@@ -1,28 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
 from app.models import Person
-from app.schemas import PersonCreate, PersonRead, PersonUpdate
+from app.schemas import PersonCreate, PersonRead, PersonUpdate, RosterImportResult, Transcript
+from app.crud import get_transcript
+from app.cache import data_versions
 from app.auth import get_current_user  # Импортируем функцию для получения текущего пользователя
 from app.models import User  # Импортируем модель пользователя для проверки роли
+from app.etags import check_table_etag
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_rows
+from app.serialization import PERSON_LIST_COLUMNS, json_response, list_format, rows_json
+from app.roster import import_roster
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Функция для проверки, является ли пользователь администратором
 def is_admin(user: User):
     return user.role == "admin"
 
 @router.get("/", response_model=list[PersonRead])
-def read_people(skip: int = 0, limit: int = 10000, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def read_people(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Depends(list_format),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
     # Пользователи могут только читать данные о людях
-    return db.query(Person).offset(skip).limit(limit).all()
+    cached = await check_table_etag(request, response, db, ("people",))
+    if cached:
+        return cached
+    statement = select(*[Person.__table__.c[name] for name in PERSON_LIST_COLUMNS])
+    names, rows = await paginate_rows(db, statement, response, [Person.id], cursor, limit)
+    return json_response(rows_json(names, rows, format), response)
+
+@router.get("/{person_id}/transcript", response_model=Transcript)
+async def read_transcript(
+    person_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Оценки студента по предметам с накопительным средним и местом в группе
+    cached = await check_table_etag(request, response, db, ("marks", "marks_archive", "people", "subjects"))
+    if cached:
+        return cached
+    student = await db.get(Person, person_id)
+    if student is None or student.type != "S":
+        raise HTTPException(status_code=404, detail="Student not found")
+    return await get_transcript(db, student)
 
 @router.post("/", response_model=PersonRead)
 def create_person(person: PersonCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -43,6 +74,21 @@ def create_person(person: PersonCreate, db: Session = Depends(get_db), current_u
     db.refresh(db_person)
     return db_person
 
+@router.post("/import", response_model=RosterImportResult)
+def import_people(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+    # Файл не читается в память целиком: COPY забирает его из временного файла по частям
+    try:
+        report = import_roster(db, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    data_versions.bump("groups")
+    return report
+
 @router.delete("/{person_id}", response_model=PersonRead)
 def delete_person(person_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     if not is_admin(current_user):
@@ -55,6 +101,7 @@ def delete_person(person_id: int, db: Session = Depends(get_db), current_user: U
         raise HTTPException(status_code=404, detail="Person not found")
     db.delete(db_person)
     db.commit()
+    data_versions.bump("users")
     return db_person
 
 @router.put("/{person_id}", response_model=PersonRead)
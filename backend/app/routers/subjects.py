@@ -1,27 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
 from app.models import Subject, User
 from app.schemas import SubjectCreate, SubjectRead
+from app.cache import data_versions
 from app.auth import get_current_user
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.reference import subjects_cache
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Функция для проверки, является ли пользователь администратором
 def is_admin(user: User):
     return user.role == "admin"
 
 @router.get("/", response_model=list[SubjectRead])
-def read_subjects(skip: int = 0, limit: int = 10000, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Доступ для всех пользователей
-    return db.query(Subject).offset(skip).limit(limit).all()
+async def read_subjects(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Доступ для всех пользователей; ответ отдаётся из кэша справочника (app.reference)
+    return await subjects_cache.page(request, db, cursor, limit)
 
 @router.post("/", response_model=SubjectRead)
 def create_subject(subject: SubjectCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -33,6 +36,7 @@ def create_subject(subject: SubjectCreate, db: Session = Depends(get_db), curren
     db_subject = Subject(name=subject.name)
     db.add(db_subject)
     db.commit()
+    data_versions.bump("subjects")
     db.refresh(db_subject)
     return db_subject
 
@@ -48,6 +52,7 @@ def delete_subject(subject_id: int, db: Session = Depends(get_db), current_user:
         raise HTTPException(status_code=404, detail="Subject not found")
     db.delete(db_subject)
     db.commit()
+    data_versions.bump("subjects")
     return db_subject
 
 @router.put("/{subject_id}", response_model=SubjectRead)
@@ -64,5 +69,6 @@ def update_subject(subject_id: int, subject: SubjectCreate, db: Session = Depend
     db_subject.name = subject.name
     db.add(db_subject)
     db.commit()
+    data_versions.bump("subjects")
     db.refresh(db_subject)
     return db_subject
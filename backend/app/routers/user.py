@@ -1,20 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
 from app.models import User
-from app.schemas import UserCreate, UserRead, UserUpdate
-from app.utils import hash_password
-from app.auth import get_current_user
+from app.schemas import UserCreate, UserRead, UserUpdate, UserBulkCreate, UserBulkResult
+from app.hashing import password_hasher
+from app.provisioning import PROVISION_HASH_CONCURRENCY, insert_users, validate_rows
+from app.auth import get_current_user, revoke_tokens
+from app.cache import data_versions
+from app.etags import check_table_etag
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Проверка роли администратора
 def is_admin(user: User):
     return user.role == "admin"
@@ -32,57 +31,104 @@ def get_user(user_id: int, db: Session = Depends(get_db), current_user: User = D
     return db_user
 
 @router.get("/", response_model=list[UserRead])
-def get_users(skip: int = 0, limit: int = 10000, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_users(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
     if not is_admin(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to perform this action"
         )
-    users = db.query(User).offset(skip).limit(limit).all()
+    cached = await check_table_etag(request, response, db, ("users",))
+    if cached:
+        return cached
+    users = await paginate(db, select(User), response, [User.id], cursor, limit)
     return users
 
 @router.post("/", response_model=UserRead)
-def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if not is_admin(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to perform this action"
         )
-    db_user = db.query(User).filter(User.login == user.login).first()
+    db_user = (await db.scalars(select(User).where(User.login == user.login))).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Login already registered")
 
-    hashed_password = hash_password(user.password)
+    # Хэширование выполняется в ограниченном пуле (app.hashing), при перегрузке - 503
+    hashed_password = await password_hasher.hash(user.password)
     db_user = User(login=user.login, password_hash=hashed_password, role=user.role, person_id=user.person_id)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    data_versions.bump("users")
     return db_user
 
+@router.post("/bulk", response_model=UserBulkResult)
+async def create_users_bulk(payload: UserBulkCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+    # Пароли хэшируются в общем пуле app.hashing с ограниченным параллелизмом; соединение с БД
+    # берётся только после хэширования, вставка пачками с ON CONFLICT (login) DO NOTHING, см. app.provisioning
+    errors, candidates = validate_rows([row.model_dump() for row in payload.users])
+    hashes = await password_hasher.hash_many([row["password"] for _, row in candidates], PROVISION_HASH_CONCURRENCY)
+    result = await db.run_sync(insert_users, candidates, hashes, errors)
+    if result["created"]:
+        data_versions.bump("users")
+    return result
+
 @router.put("/{user_id}", response_model=UserRead)
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_user(user_id: int, user_update: UserUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if not is_admin(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to perform this action"
         )
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user_update.login:
         db_user.login = user_update.login
     if user_update.password:
-        db_user.password_hash = hash_password(user_update.password)
+        db_user.password_hash = await password_hasher.hash(user_update.password)
     if user_update.role:
         db_user.role = user_update.role
     if user_update.person_id:
         db_user.person_id = user_update.person_id
+    # Роль и person_id зашиты в выданные токены, поэтому любое изменение их отзывает
+    revoke_tokens(db_user)
 
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    data_versions.bump("users")
     return db_user
 
+@router.post("/{user_id}/revoke-tokens")
+def revoke_user_tokens(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action"
+        )
+    db_user = db.query(User).filter(User.id == user_id).first()
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    revoke_tokens(db_user)
+    db.commit()
+    data_versions.bump("users")
+    return {"detail": "User tokens revoked"}
+
 @router.delete("/{user_id}")
 def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     if not is_admin(current_user):
@@ -96,20 +142,22 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User
     
     db.delete(db_user)
     db.commit()
+    data_versions.bump("users")
     return {"detail": "User deleted successfully"}
 
 @router.post("/sos", response_model=UserRead)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.login == user.login).first()
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.scalars(select(User).where(User.login == user.login))).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Login already registered")
 
-    hashed_password = hash_password(user.password)
+    hashed_password = await password_hasher.hash(user.password)
 
     db_user = User(login=user.login, password_hash=hashed_password, role=user.role, person_id=user.person_id)
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    data_versions.bump("users")
     return db_user
 
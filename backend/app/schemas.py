@@ -1,9 +1,10 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Literal
+from datetime import date, datetime
 
 class GroupBase(BaseModel):
     name: str
+    graduated_at: Optional[date] = None
 
 class GroupCreate(GroupBase):
     pass
@@ -16,6 +17,7 @@ class GroupRead(GroupBase):
 
 class GroupUpdate(BaseModel):
     name: str  # Здесь можно добавить другие поля для обновлений, если необходимо
+    graduated_at: Optional[date] = None
 
     class Config:
         orm_mode = True
@@ -47,6 +49,13 @@ class PersonUpdate(BaseModel):
     class Config:
         orm_mode = True
 
+class RosterImportResult(BaseModel):
+    rows: int
+    groups_created: int
+    people_created: int
+    people_skipped: int  # Уже существующие люди и дубликаты внутри файла
+    rejected_lines: List[int]
+
 class SubjectBase(BaseModel):
     name: str
 
@@ -74,6 +83,18 @@ class MarkRead(MarkBase):
 
     class Config:
         orm_mode = True
+
+class MarkBulkCreate(BaseModel):
+    marks: List[MarkCreate] = Field(..., min_length=1, max_length=10000)  # Ведомость целиком, одним запросом
+
+class MarkBulkError(BaseModel):
+    index: int  # Номер строки во входном списке
+    detail: str
+
+class MarkBulkResult(BaseModel):
+    inserted: int
+    ids: List[int]  # id созданных оценок в порядке входных строк (без строк с ошибками)
+    errors: List[MarkBulkError]
 class UserBase(BaseModel):
     login: str
     role: str
@@ -103,6 +124,28 @@ class UserUpdate(BaseModel):
     role: Optional[str]
     person_id: Optional[int]
 
+class UserBulkRow(BaseModel):
+    login: str
+    password: str
+    person_id: Optional[int] = None
+    role: str = "user"
+
+class UserBulkCreate(BaseModel):
+    users: List[UserBulkRow] = Field(..., min_length=1, max_length=10000)
+
+class UserBulkError(BaseModel):
+    index: int  # Номер строки во входном списке
+    login: str
+    detail: str
+
+class UserBulkResult(BaseModel):
+    created: int
+    ids: List[int]  # id созданных пользователей в порядке входных строк (без строк с ошибками)
+    errors: List[UserBulkError]
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class AverageGradeRequest(BaseModel):
     start_date: str  # Date in 'YYYY-MM-DD' format
     end_date: str  # Date in 'YYYY-MM-DD' format
@@ -110,4 +153,68 @@ class AverageGradeRequest(BaseModel):
 
 class AverageGradeResponse(BaseModel):
     entity: str  # The entity we are averaging for (student, group, teacher, etc.)
-    average_grade: float  # The computed average grade for that entity
\ No newline at end of file
+    average_grade: float  # The computed average grade for that entity
+
+class RankingRequest(BaseModel):
+    start_date: str  # Date in 'YYYY-MM-DD' format
+    end_date: str  # Date in 'YYYY-MM-DD' format
+    partition_by: Literal["group", "subject", "all"] = "group"  # Внутри чего считаются места
+    top: Optional[int] = Field(default=None, ge=1)  # Первые N мест в каждой группе/предмете (с учётом равных)
+
+class RankingEntry(BaseModel):
+    partition_id: Optional[int] = None  # id группы или предмета; пусто для partition_by='all'
+    partition: Optional[str] = None
+    student_id: int
+    student: str
+    average_grade: float
+    marks_count: int
+    rank: int  # 1 - лучший средний балл
+    percentile: float  # Доля студентов с более низким средним баллом, 0..100
+
+class TrendRequest(BaseModel):
+    start_date: str  # Date in 'YYYY-MM-DD' format
+    end_date: str  # Date in 'YYYY-MM-DD' format, inclusive
+    bucket: Literal["day", "week", "month", "semester"] = "month"
+    split_by: Optional[Literal["group", "subject", "teacher"]] = None  # Без разбиения - одна линия по всем оценкам
+
+class TrendPoint(BaseModel):
+    bucket: date  # Первый день интервала (понедельник для недели, начало семестра для семестра)
+    entity_id: Optional[int] = None
+    entity: Optional[str] = None
+    average_grade: float
+    marks_count: int
+
+class TranscriptMark(BaseModel):
+    id: int
+    value: int
+    teacher_id: int
+    created_at: datetime
+    subject_running_average: float  # Средний балл по предмету на момент этой оценки
+    running_average: float  # Средний балл по всем предметам на момент этой оценки
+
+class TranscriptSubject(BaseModel):
+    subject_id: int
+    subject_name: str
+    average: float
+    group_rank: Optional[int] = None  # Место среди студентов группы по среднему баллу за предмет, null без группы
+    group_ranked: Optional[int] = None  # Сколько студентов группы имеют оценки по предмету
+    marks: List[TranscriptMark]
+
+class Transcript(BaseModel):
+    student: PersonRead
+    average: Optional[float] = None
+    group_rank: Optional[int] = None
+    group_ranked: Optional[int] = None
+    subjects: List[TranscriptSubject]
+
+class AnalyticsRequest(BaseModel):
+    start_date: Optional[str] = None  # Date in 'YYYY-MM-DD' format
+    end_date: Optional[str] = None  # Date in 'YYYY-MM-DD' format, inclusive
+    group_id: Optional[int] = None
+    student_id: Optional[int] = None
+    subject_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    # Наборы группировки, все считаются одним запросом; первый набор идёт в table и chart
+    groupings: List[List[Literal["group", "student", "subject", "teacher"]]] = Field(
+        default=[["group", "student", "subject", "teacher"]], min_length=1, max_length=16
+    )
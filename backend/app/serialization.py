@@ -0,0 +1,42 @@
+from decimal import Decimal
+import orjson
+from fastapi import Query, Response
+
+# Столбцы списков в том же порядке, что и поля MarkRead / PersonRead, чтобы ответ не отличался от прежнего
+MARK_LIST_COLUMNS = ("student_id", "subject_id", "teacher_id", "value", "id", "created_at")
+PERSON_LIST_COLUMNS = ("first_name", "last_name", "father_name", "group_id", "type", "id")
+
+
+def _default(value):
+    # avg() по Numeric приходит как Decimal
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+def list_format(format: str = Query("objects", pattern="^(objects|columns)$")) -> str:
+    # objects - массив объектов; columns - объект с параллельными массивами значений по каждому столбцу
+    return format
+
+
+def rows_json(names: list, rows: list, format: str = "objects") -> bytes:
+    # Кортежи из Core-запроса сериализуются orjson напрямую, без ORM-объектов и валидации Pydantic
+    if format == "columns":
+        columns = list(zip(*rows)) if rows else [() for _ in names]
+        return orjson.dumps({name: list(values) for name, values in zip(names, columns)}, default=_default)
+    return orjson.dumps([dict(zip(names, row)) for row in rows], default=_default)
+
+
+def list_responses(model, description: str) -> dict:
+    # Описание ответа списка для OpenAPI вместо response_model: ответ собирается из кортежей,
+    # ?fields и ?expand меняют набор ключей, а ?format=columns - саму форму
+    properties = model.model_json_schema()["properties"]
+    objects = {"type": "array", "items": {"type": "object", "properties": properties}}
+    columns = {"type": "object", "properties": {name: {"type": "array", "items": schema} for name, schema in properties.items()}}
+    return {200: {"description": description, "content": {"application/json": {"schema": {"oneOf": [objects, columns]}}}}}
+
+
+def json_response(content: bytes, response: Response) -> Response:
+    # Заголовки, выставленные на response (курсор, ETag), переносятся в итоговый ответ
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(content=content, media_type="application/json", headers=headers)
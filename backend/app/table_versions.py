@@ -0,0 +1,29 @@
+# Счётчики изменений таблиц в БД: table_versions(table_name, shard, version).
+# Триггер уровня оператора увеличивает счётчик при любой записи в таблицу, включая каскадные
+# удаления и запись в обход API, поэтому все воркеры uvicorn видят изменение одним чтением по PK
+
+# Счётчик таблицы разбит на TABLE_VERSION_SHARDS строк: соединение увеличивает строку своего
+# сегмента, поэтому параллельные транзакции записи не ждут друг друга на одной строке.
+# Версия таблицы - сумма сегментов; она растёт при каждом commit с записью в таблицу
+TABLE_VERSION_SHARDS = 8
+
+TABLE_VERSION_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION table_versions_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, shard, version) VALUES (TG_TABLE_NAME, pg_backend_pid() % {TABLE_VERSION_SHARDS}, 1)
+    ON CONFLICT (table_name, shard) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
+"""
+
+# Таблицы, для которых ведётся счётчик
+VERSIONED_TABLES = ("groups", "subjects", "people", "marks", "marks_archive", "users")
+
+
+def table_version_trigger(table: str) -> str:
+    return f"""
+CREATE TRIGGER {table}_version_bump
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+FOR EACH STATEMENT EXECUTE FUNCTION table_versions_bump();
+"""
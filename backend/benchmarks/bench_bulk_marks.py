@@ -0,0 +1,73 @@
+"""Сравнение POST /marks (по одной оценке) и POST /marks/bulk.
+
+Запускается против работающего сервера на тестовой базе, в которой уже есть
+хотя бы один студент, преподаватель и предмет. Созданные оценки не удаляются.
+
+    python benchmarks/bench_bulk_marks.py --login admin --password secret --count 500
+"""
+import argparse
+import json
+import random
+import time
+import urllib.parse
+import urllib.request
+
+
+def request(method, url, token=None, body=None, form=None):
+    headers = {}
+    data = None
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+        data = json.dumps(body).encode()
+    if form is not None:
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+        data = urllib.parse.urlencode(form).encode()
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--login", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+
+    token = request("POST", f"{args.url}/auth/token", form={"username": args.login, "password": args.password})["access_token"]
+    people = request("GET", f"{args.url}/people/?limit=1000", token)
+    subjects = request("GET", f"{args.url}/subjects/?limit=1000", token)
+    students = [p["id"] for p in people if p["type"] == "S"]
+    teachers = [p["id"] for p in people if p["type"] == "P"]
+    subject_ids = [s["id"] for s in subjects]
+
+    marks = [
+        {
+            "student_id": random.choice(students),
+            "teacher_id": random.choice(teachers),
+            "subject_id": random.choice(subject_ids),
+            "value": random.randint(2, 5),
+        }
+        for _ in range(args.count)
+    ]
+
+    start = time.perf_counter()
+    for mark in marks:
+        request("POST", f"{args.url}/marks/", token, body=mark)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = request("POST", f"{args.url}/marks/bulk", token, body={"marks": marks})
+    bulk = time.perf_counter() - start
+
+    print(f"marks:        {args.count}")
+    print(f"single-row:   {single:.3f} s ({args.count / single:.0f} marks/s)")
+    print(f"bulk:         {bulk:.3f} s ({args.count / bulk:.0f} marks/s), inserted {result['inserted']}, errors {len(result['errors'])}")
+    print(f"speedup:      {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Отчёт за один семестр по 10 годам синтетических оценок: обычная таблица против секций по учебным годам.
+
+Создаются две рабочие таблицы с одинаковыми данными и индексами, как у marks: bench_marks_flat
+(одна куча) и bench_marks_part (PARTITION BY RANGE (created_at), секция на учебный год).
+Для каждого запроса отчёта снимается EXPLAIN (ANALYZE, BUFFERS): время, прочитанные страницы
+и число секций в плане. Затем сравнивается VACUUM всей обычной таблицы и секции последнего года.
+--order random раскладывает даты по строкам в случайном порядке, как benchmarks/seed.py
+(исторические загрузки, правки задним числом); --order time - в порядке вставки, и тогда
+обычная таблица уже физически упорядочена по created_at.
+Рабочие таблицы удаляются в конце, если не передан --keep. Запускать только на тестовой базе.
+
+    python benchmarks/bench_partitions.py --marks 5000000 --start-year 2015 --years 10
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+FLAT = "bench_marks_flat"
+PARTITIONED = "bench_marks_part"
+
+COLUMNS = (
+    "id integer NOT NULL, student_id integer NOT NULL, subject_id integer NOT NULL,"
+    " teacher_id integer NOT NULL, value integer NOT NULL, created_at timestamp NOT NULL"
+)
+INDEXES = (
+    "(created_at, id)",
+    "(student_id, created_at) INCLUDE (value)",
+    "(subject_id, created_at) INCLUDE (value)",
+    "(teacher_id, created_at) INCLUDE (value)",
+)
+
+# Запросы, которые читают marks по диапазону дат: рейтинг по предметам и средний балл по предметам
+QUERIES = {
+    "subject_ranking": (
+        "SELECT student_id, subject_id, sum(value), count(*) FROM {table}"
+        " WHERE created_at >= :start AND created_at < :end GROUP BY student_id, subject_id"
+    ),
+    "subject_average": (
+        "SELECT subject_id, avg(value) FROM {table}"
+        " WHERE created_at >= :start AND created_at < :end GROUP BY subject_id"
+    ),
+    "one_student": (
+        "SELECT avg(value) FROM {table}"
+        " WHERE student_id = 1 AND created_at >= :start AND created_at < :end"
+    ),
+}
+
+
+def create_tables(conn, marks, students, subjects, teachers, start_year, years, order):
+    conn.execute(text(f"DROP TABLE IF EXISTS {FLAT}, {PARTITIONED} CASCADE"))
+    conn.execute(text(f"CREATE TABLE {FLAT} ({COLUMNS}, PRIMARY KEY (id))"))
+    conn.execute(text(f"CREATE TABLE {PARTITIONED} ({COLUMNS}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)"))
+    for year in range(start_year, start_year + years):
+        conn.execute(text(
+            f"CREATE TABLE {PARTITIONED}_y{year} PARTITION OF {PARTITIONED}"
+            f" FOR VALUES FROM ('{year}-09-01') TO ('{year + 1}-09-01')"
+        ))
+
+    # Доля пройденного периода: случайная или по порядку вставки
+    offset = "random()" if order == "random" else "(i - 1)::float / :marks"
+    conn.execute(text(
+        f"INSERT INTO {FLAT}"
+        " SELECT i, 1 + floor(random() * :students)::int, 1 + floor(random() * :subjects)::int,"
+        "        1 + floor(random() * :teachers)::int, 2 + floor(random() * 4)::int,"
+        f"        make_timestamp(:start_year, 9, 1, 0, 0, 0) + {offset} * make_interval(years => :years)"
+        " FROM generate_series(1, :marks) i"
+    ), {"marks": marks, "students": students, "subjects": subjects, "teachers": teachers,
+        "start_year": start_year, "years": years})
+    conn.execute(text(f"INSERT INTO {PARTITIONED} SELECT * FROM {FLAT}"))
+
+    for table in (FLAT, PARTITIONED):
+        for columns in INDEXES:
+            conn.execute(text(f"CREATE INDEX ON {table} {columns}"))
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+def explain(conn, sql, params):
+    plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), params).scalar()[0]
+
+    def relations(node):
+        found = {node["Relation Name"]} if "Relation Name" in node else set()
+        for child in node.get("Plans", []):
+            found |= relations(child)
+        return found
+
+    root = plan["Plan"]
+    pages = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+    return plan["Execution Time"], pages, len(relations(root))
+
+
+def best(conn, sql, params, repeat):
+    runs = [explain(conn, sql, params) for _ in range(repeat)]
+    return min(runs, key=lambda run: run[0])
+
+
+def vacuum_seconds(table):
+    # VACUUM нельзя выполнять внутри транзакции
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        start = time.perf_counter()
+        conn.execute(text(f"VACUUM (ANALYZE) {table}"))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--marks", type=int, default=5000000)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--subjects", type=int, default=100)
+    parser.add_argument("--teachers", type=int, default=500)
+    parser.add_argument("--start-year", type=int, default=2015)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--order", choices=("random", "time"), default="random")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="не удалять рабочие таблицы")
+    args = parser.parse_args()
+
+    # Весенний семестр последнего учебного года
+    last_year = args.start_year + args.years
+    params = {"start": f"{last_year}-02-01", "end": f"{last_year}-07-01"}
+
+    with engine.begin() as conn:
+        start = time.perf_counter()
+        create_tables(conn, args.marks, args.students, args.subjects, args.teachers, args.start_year, args.years, args.order)
+        print(f"Loaded {args.marks} marks into both tables in {time.perf_counter() - start:.1f} s")
+
+    print(f"Semester {params['start']} .. {params['end']}")
+    print(f"{'query':<16} {'flat ms':>10} {'part ms':>10} {'flat pages':>11} {'part pages':>11} {'partitions':>11}")
+    with engine.begin() as conn:
+        for name, sql in QUERIES.items():
+            flat_ms, flat_pages, _ = best(conn, sql.format(table=FLAT), params, args.repeat)
+            part_ms, part_pages, scanned = best(conn, sql.format(table=PARTITIONED), params, args.repeat)
+            print(f"{name:<16} {flat_ms:>10.1f} {part_ms:>10.1f} {flat_pages:>11} {part_pages:>11} {scanned:>11}")
+
+    newest = f"{PARTITIONED}_y{last_year - 1}"
+    print(f"VACUUM {FLAT}: {vacuum_seconds(FLAT):.2f} s, {newest}: {vacuum_seconds(newest):.2f} s")
+
+    if not args.keep:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {FLAT}, {PARTITIONED} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Процессорное время и пик памяти на сериализацию списка оценок: ORM + MarkRead против Core + orjson.
+
+Старый путь повторяет то, что делал FastAPI для response_model=list[MarkRead]: загрузка ORM-объектов,
+валидация каждого через Pydantic (from_attributes), json.dumps. Новый путь - выборка кортежей
+столбцов и orjson, как в GET /marks. Время и память снимаются в отдельных прогонах,
+потому что tracemalloc сам замедляет выполнение.
+
+    python benchmarks/seed.py --marks 200000
+    python benchmarks/bench_serialization.py --rows 100000 --repeat 3
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models import Mark
+from app.schemas import MarkRead
+from app.serialization import MARK_LIST_COLUMNS, rows_json
+
+MARKS_ADAPTER = TypeAdapter(list[MarkRead])
+
+
+def orm_pydantic(db, rows):
+    marks = db.scalars(select(Mark).order_by(Mark.id).limit(rows)).all()
+    validated = MARKS_ADAPTER.validate_python(marks, from_attributes=True)
+    return json.dumps(MARKS_ADAPTER.dump_python(validated, mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def core_orjson(db, rows):
+    statement = select(*[Mark.__table__.c[name] for name in MARK_LIST_COLUMNS]).order_by(Mark.id).limit(rows)
+    result = db.execute(statement)
+    names = list(result.keys())
+    return rows_json(names, result.all())
+
+
+def measure(func, rows, repeat):
+    times = []
+    size = 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            gc.collect()
+            start = time.process_time()
+            size = len(func(db, rows))
+            times.append(time.process_time() - start)
+        finally:
+            db.close()
+
+    db = SessionLocal()
+    try:
+        gc.collect()
+        tracemalloc.start()
+        func(db, rows)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        db.close()
+    return min(times), peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'path':<14} {'cpu s':>8} {'peak MiB':>10} {'bytes':>12}")
+    for name, func in (("orm+pydantic", orm_pydantic), ("core+orjson", core_orjson)):
+        cpu, peak, size = measure(func, args.rows, args.repeat)
+        print(f"{name:<14} {cpu:>8.3f} {peak / 2 ** 20:>10.1f} {size:>12}")
+
+
+if __name__ == "__main__":
+    main()
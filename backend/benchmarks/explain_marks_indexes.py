@@ -0,0 +1,88 @@
+"""EXPLAIN ANALYZE запросов отчёта по среднему баллу до и после составных индексов на marks.
+
+Индексы ix_marks_*_created_at удаляются, снимаются планы, затем индексы создаются
+заново и планы снимаются ещё раз. Запускать только на тестовой базе.
+
+    python benchmarks/seed.py --marks 1000000
+    python benchmarks/explain_marks_indexes.py --start 2023-09-01 --end 2024-01-31
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+INDEXES = {
+    "ix_marks_student_id_created_at": "CREATE INDEX ix_marks_student_id_created_at ON marks (student_id, created_at) INCLUDE (value)",
+    "ix_marks_subject_id_created_at": "CREATE INDEX ix_marks_subject_id_created_at ON marks (subject_id, created_at) INCLUDE (value)",
+    "ix_marks_teacher_id_created_at": "CREATE INDEX ix_marks_teacher_id_created_at ON marks (teacher_id, created_at) INCLUDE (value)",
+}
+
+# Те же запросы, что строит /average_grade/calculate-average-grade, плюс выборка одного студента
+QUERIES = {
+    "students": (
+        "SELECT people.id, people.first_name, people.last_name, avg(marks.value) FROM people"
+        " LEFT OUTER JOIN marks ON people.id = marks.student_id"
+        " WHERE marks.created_at >= :start AND marks.created_at <= :end GROUP BY people.id"
+    ),
+    "teachers": (
+        "SELECT people.id, people.first_name, people.last_name, avg(marks.value) FROM people"
+        " LEFT OUTER JOIN marks ON people.id = marks.teacher_id"
+        " WHERE marks.created_at >= :start AND marks.created_at <= :end GROUP BY people.id"
+    ),
+    "subjects": (
+        "SELECT subjects.id, subjects.name, avg(marks.value) FROM subjects"
+        " LEFT OUTER JOIN marks ON subjects.id = marks.subject_id"
+        " WHERE marks.created_at >= :start AND marks.created_at <= :end GROUP BY subjects.id, subjects.name"
+    ),
+    "one_student": (
+        "SELECT avg(marks.value) FROM marks"
+        " WHERE marks.student_id = (SELECT min(student_id) FROM marks)"
+        " AND marks.created_at >= :start AND marks.created_at <= :end"
+    ),
+}
+
+
+def explain(conn, params):
+    plans = {}
+    for name, sql in QUERIES.items():
+        plan = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), params).scalar()
+        plans[name] = plan[0]
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="2023-09-01")
+    parser.add_argument("--end", default="2024-01-31")
+    parser.add_argument("--output", help="куда сохранить полные планы в JSON")
+    args = parser.parse_args()
+    params = {"start": args.start, "end": args.end}
+
+    with engine.begin() as conn:
+        for name in INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("ANALYZE marks"))
+        before = explain(conn, params)
+
+        for sql in INDEXES.values():
+            conn.execute(text(sql))
+        conn.execute(text("ANALYZE marks"))
+        after = explain(conn, params)
+
+    print(f"{'query':<12} {'before, ms':>12} {'after, ms':>12}  plan after")
+    for name in QUERIES:
+        b = before[name]["Execution Time"]
+        a = after[name]["Execution Time"]
+        print(f"{name:<12} {b:>12.1f} {a:>12.1f}  {after[name]['Plan']['Node Type']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"before": before, "after": after}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Нагрузочный тест эндпоинтов чтения: N одновременных клиентов с keep-alive соединениями.
+
+Для сравнения синхронного и асинхронного пути тест запускается против сервера,
+собранного из разных ревизий, с одинаковыми параметрами uvicorn и той же базой:
+
+    uvicorn app.main:app --workers 1
+    python benchmarks/load_test.py --login admin --password secret --clients 200 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import time
+import urllib.parse
+import urllib.request
+
+DEFAULT_PATHS = [
+    "GET /marks/?limit=100",
+    "GET /people/?limit=100",
+    "GET /groups/",
+    "GET /subjects/",
+    'POST /average_grade/calculate-average-grade {"start_date": "2023-09-01", "end_date": "2024-01-31", "filter_by": "groups"}',
+]
+
+
+def login(url, username, password):
+    data = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    with urllib.request.urlopen(f"{url}/auth/token", data=data) as resp:
+        return json.loads(resp.read())["access_token"]
+
+
+def build_request(spec, host, token):
+    method, rest = spec.split(" ", 1)
+    path, _, body = rest.partition(" ")
+    body = body.encode()
+    headers = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {host}",
+        f"Authorization: Bearer {token}",
+        "Accept-Encoding: identity",
+        f"Content-Length: {len(body)}",
+    ]
+    if body:
+        headers.append("Content-Type: application/json")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, requests, deadline, timeout, latencies, errors, offset):
+    writer = None
+    i = offset
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(requests[i % len(requests)])
+            await writer.drain()
+            status = await asyncio.wait_for(read_response(reader), timeout)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            # Разрыв или таймаут считаем ошибкой и открываем соединение заново
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+        i += 1
+    if writer is not None:
+        writer.close()
+
+
+async def run(args, token):
+    parsed = urllib.parse.urlparse(args.url)
+    host, port = parsed.hostname, parsed.port or 80
+    requests = [build_request(spec, f"{host}:{port}", token) for spec in (args.path or DEFAULT_PATHS)]
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        client(host, port, requests, deadline, args.timeout, latencies, errors, i) for i in range(args.clients)
+    ])
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--login", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--timeout", type=float, default=30, help="таймаут одного запроса, с")
+    parser.add_argument("--path", action="append", help='например "GET /marks/?limit=100"; можно несколько раз')
+    args = parser.parse_args()
+
+    token = login(args.url, args.login, args.password)
+    latencies, errors, elapsed = asyncio.run(run(args, token))
+    latencies.sort()
+
+    print(f"clients:     {args.clients}")
+    print(f"requests:    {len(latencies)} in {elapsed:.1f} s, errors: {len(errors)}")
+    print(f"throughput:  {len(latencies) / elapsed:.0f} req/s")
+    if latencies:
+        print(f"latency ms:  p50 {percentile(latencies, 0.5):.1f}  p95 {percentile(latencies, 0.95):.1f}  p99 {percentile(latencies, 0.99):.1f}")
+
+
+if __name__ == "__main__":
+    main()
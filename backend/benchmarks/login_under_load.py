@@ -0,0 +1,96 @@
+"""Задержка входа (POST /auth/token) при одновременной нагрузке на эндпоинты чтения.
+
+Фоновые клиенты непрерывно читают списки, параллельно другие клиенты входят в систему.
+Сравнивается p99 входа и пропускная способность чтения до и после вынесения bcrypt в пул:
+
+    python benchmarks/login_under_load.py --login admin --password secret --readers 100 --logins 50 --duration 30
+"""
+import argparse
+import asyncio
+import time
+import urllib.parse
+
+from load_test import DEFAULT_PATHS, build_request, login, percentile, read_response
+
+
+def build_login_request(host, username, password):
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    headers = [
+        "POST /auth/token HTTP/1.1",
+        f"Host: {host}",
+        "Content-Type: application/x-www-form-urlencoded",
+        f"Content-Length: {len(body)}",
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+async def worker(host, port, requests, deadline, timeout, latencies, statuses, offset):
+    writer = None
+    i = offset
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(requests[i % len(requests)])
+            await writer.drain()
+            status = await asyncio.wait_for(read_response(reader), timeout)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+            if writer is not None:
+                writer.close()
+            writer = None
+        i += 1
+    if writer is not None:
+        writer.close()
+
+
+async def run(args, token):
+    parsed = urllib.parse.urlparse(args.url)
+    host, port = parsed.hostname, parsed.port or 80
+    address = f"{host}:{port}"
+    reads = [build_request(spec, address, token) for spec in (args.path or DEFAULT_PATHS)]
+    logins = [build_login_request(address, args.login, args.password)]
+
+    read_latencies, read_statuses = [], {}
+    login_latencies, login_statuses = [], {}
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[worker(host, port, reads, deadline, args.timeout, read_latencies, read_statuses, i) for i in range(args.readers)],
+        *[worker(host, port, logins, deadline, args.timeout, login_latencies, login_statuses, 0) for _ in range(args.logins)],
+    )
+    elapsed = time.perf_counter() - started
+    return (read_latencies, read_statuses), (login_latencies, login_statuses), elapsed
+
+
+def report(name, latencies, statuses, elapsed):
+    latencies.sort()
+    print(f"{name}:")
+    print(f"  requests:   {len(latencies)} ({len(latencies) / elapsed:.0f} req/s), statuses: {statuses}")
+    if latencies:
+        print(f"  latency ms: p50 {percentile(latencies, 0.5):.1f}  p95 {percentile(latencies, 0.95):.1f}  p99 {percentile(latencies, 0.99):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--login", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--readers", type=int, default=100, help="клиентов, читающих списки")
+    parser.add_argument("--logins", type=int, default=50, help="клиентов, выполняющих вход")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--timeout", type=float, default=30, help="таймаут одного запроса, с")
+    parser.add_argument("--path", action="append", help='эндпоинт чтения, например "GET /marks/?limit=100"')
+    args = parser.parse_args()
+
+    token = login(args.url, args.login, args.password)
+    reads, logins, elapsed = asyncio.run(run(args, token))
+    report("reads", *reads, elapsed)
+    report("logins", *logins, elapsed)
+
+
+if __name__ == "__main__":
+    main()
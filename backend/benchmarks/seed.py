@@ -0,0 +1,78 @@
+"""Заполнение тестовой базы синтетическими группами, людьми, предметами и оценками.
+
+Все строки помечаются (группы BENCH-*, фамилия Bench, предметы Bench subject *),
+повторный запуск добавляет новые оценки к уже созданным людям.
+
+    python benchmarks/seed.py --marks 1000000 --years 5
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date
+from sqlalchemy import text
+from app.database import engine
+from app import models
+from app.partitions import ensure_mark_partitions
+
+
+def seed(conn, groups=200, students=20000, teachers=500, subjects=100, marks=1000000, start_year=2020, years=5):
+    conn.execute(text(
+        "INSERT INTO groups (name) SELECT 'BENCH-' || g FROM generate_series(1, :groups) g"
+        " ON CONFLICT (name) DO NOTHING"
+    ), {"groups": groups})
+    conn.execute(text(
+        "INSERT INTO subjects (name) SELECT 'Bench subject ' || s FROM generate_series(1, :subjects) s"
+        " ON CONFLICT (name) DO NOTHING"
+    ), {"subjects": subjects})
+
+    existing = conn.execute(text("SELECT count(*) FROM people WHERE last_name = 'Bench'")).scalar()
+    if existing == 0:
+        conn.execute(text(
+            "INSERT INTO people (first_name, last_name, group_id, type)"
+            " SELECT 'Student' || i, 'Bench', g.ids[1 + i % array_length(g.ids, 1)], 'S'"
+            " FROM generate_series(1, :students) i,"
+            " (SELECT array_agg(id) AS ids FROM groups WHERE name LIKE 'BENCH-%') g"
+        ), {"students": students})
+        conn.execute(text(
+            "INSERT INTO people (first_name, last_name, type)"
+            " SELECT 'Teacher' || i, 'Bench', 'P' FROM generate_series(1, :teachers) i"
+        ), {"teachers": teachers})
+
+    conn.execute(text(
+        "INSERT INTO marks (student_id, subject_id, teacher_id, value, created_at)"
+        " SELECT s.ids[1 + floor(random() * array_length(s.ids, 1))::int],"
+        "        sub.ids[1 + floor(random() * array_length(sub.ids, 1))::int],"
+        "        t.ids[1 + floor(random() * array_length(t.ids, 1))::int],"
+        "        2 + floor(random() * 4)::int,"
+        "        make_timestamp(:start_year, 9, 1, 0, 0, 0) + random() * make_interval(years => :years)"
+        " FROM generate_series(1, :marks),"
+        " (SELECT array_agg(id) AS ids FROM people WHERE last_name = 'Bench' AND type = 'S') s,"
+        " (SELECT array_agg(id) AS ids FROM people WHERE last_name = 'Bench' AND type = 'P') t,"
+        " (SELECT array_agg(id) AS ids FROM subjects WHERE name LIKE 'Bench subject %') sub"
+    ), {"marks": marks, "start_year": start_year, "years": years})
+    conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--teachers", type=int, default=500)
+    parser.add_argument("--subjects", type=int, default=100)
+    parser.add_argument("--marks", type=int, default=1000000)
+    parser.add_argument("--start-year", type=int, default=2020)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Секции под весь диапазон синтетических оценок, чтобы они не оседали в marks_default
+        ensure_mark_partitions(conn, today=date(args.start_year, 9, 1), ahead=args.years)
+        seed(conn, args.groups, args.students, args.teachers, args.subjects, args.marks, args.start_year, args.years)
+    print(f"Inserted {args.marks} marks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Перенос исторических оценок в marks_archive.
+
+Переносятся оценки старше MARK_ARCHIVE_AFTER_DAYS дней (или --before) и оценки студентов
+групп с заполненной датой выпуска (groups.graduated_at). Перенос идёт пачками по --batch-size,
+каждая пачка фиксируется отдельно, поэтому скрипт можно запускать по расписанию и прерывать.
+
+    python scripts/archive_marks.py --before 2020-09-01
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.archive import MARK_ARCHIVE_BATCH_SIZE, archive_marks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--before", type=datetime.fromisoformat, help="архивировать оценки раньше этой даты")
+    parser.add_argument("--batch-size", type=int, default=MARK_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = archive_marks(db, args.before, args.batch_size)
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Создание секций marks на текущий и следующие учебные годы.
+
+Приложение проверяет секции при запуске и раз в MARK_PARTITION_CHECK_INTERVAL секунд; скрипт
+делает то же самое без него, например из cron перед началом учебного года. Оценки, попавшие
+в marks_default, переносятся в созданные секции.
+
+    python scripts/ensure_partitions.py --ahead 3
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+from app.partitions import MARK_PARTITIONS_AHEAD, ensure_mark_partitions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ahead", type=int, default=MARK_PARTITIONS_AHEAD, help="на сколько учебных лет вперёд создать секции")
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        partitions = ensure_mark_partitions(connection, ahead=args.ahead)
+
+    print(json.dumps({"partitions": partitions}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
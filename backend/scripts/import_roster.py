@@ -0,0 +1,35 @@
+"""Загрузка списка групп и людей из CSV.
+
+Колонки: first_name, last_name, father_name, group (или group_name), type.
+
+    python scripts/import_roster.py roster.csv
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.roster import import_roster
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            report = import_roster(db, f)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Массовое создание учётных записей из CSV.
+
+Колонки: login, password, person_id (может быть пустым), role (user или admin, по умолчанию user).
+Строки с ошибками и занятыми логинами выводятся в отчёте, остальные создаются.
+
+    python scripts/provision_users.py users.csv --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.provisioning import PROVISION_HASH_WORKERS, provision_users
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = {"login", "password"} - set(reader.fieldnames or [])
+        if missing:
+            sys.exit(f"Missing columns: {', '.join(sorted(missing))}")
+        rows = []
+        for line, row in enumerate(reader, start=2):
+            person_id = (row.get("person_id") or "").strip()
+            if person_id and not person_id.isdigit():
+                sys.exit(f"Line {line}: person_id must be an integer")
+            rows.append({
+                "login": row["login"].strip(),
+                "password": row["password"],
+                "person_id": int(person_id) if person_id else None,
+                "role": (row.get("role") or "user").strip(),
+            })
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=PROVISION_HASH_WORKERS, help="потоков для bcrypt")
+    args = parser.parse_args()
+
+    rows = read_rows(args.path)
+    db = SessionLocal()
+    try:
+        report = provision_users(db, rows, args.workers)
+    finally:
+        db.close()
+
+    # В отчёте номера строк CSV (с учётом заголовка), а не индексы списка
+    for error in report["errors"]:
+        error["line"] = error.pop("index") + 2
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Тесты эндпоинтов идут на PostgreSQL: секции, триггеры и счётчики table_versions есть только там.
+# TEST_DATABASE_URL должен указывать на отдельную пустую базу - схема public пересоздаётся в каждом тесте.
+# Без него тесты, которым нужна база, пропускаются
+import os
+import sys
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import auth, models
+from app.archive import archive_horizon
+from app.auth import get_current_user
+from app.cache import token_version_cache
+from app.database import get_async_db, get_db
+from app.routers import average_grade, marks, user
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def db():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL, poolclass=NullPool)
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    models.Base.metadata.create_all(bind=engine)
+    archive_horizon.invalidate()
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def async_engine(db):
+    # Каждый запрос TestClient выполняется в своём цикле событий, поэтому соединения asyncpg не переиспользуются
+    engine = create_async_engine(make_url(TEST_DATABASE_URL).set(drivername="postgresql+asyncpg"), poolclass=NullPool)
+    yield engine
+
+
+def make_app(db, async_engine, *routers) -> FastAPI:
+    async_session = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def async_db():
+        async with async_session() as session:
+            yield session
+
+    app = FastAPI()
+    for router, prefix in routers:
+        app.include_router(router, prefix=prefix)
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_async_db] = async_db
+    return app
+
+
+@pytest.fixture
+def client(db, async_engine):
+    app = make_app(db, async_engine, (marks.router, "/marks"), (user.router, "/users"))
+    admin = models.User(id=1, login="admin", password_hash="x", role="admin")
+    app.dependency_overrides[get_current_user] = lambda: admin
+    yield TestClient(app)
+
+
+@pytest.fixture
+def auth_client(db, async_engine):
+    # Настоящая проверка JWT: кэш версий токенов и счётчик users процесса сбрасываются между тестами
+    token_version_cache.clear()
+    auth._users_version.update(version=None, polled_at=None)
+    app = make_app(db, async_engine, (auth.router, "/auth"), (user.router, "/users"), (average_grade.router, "/average_grade"))
+    yield TestClient(app)
+
+
+@pytest.fixture
+def marks_data(db):
+    # Группа из трёх студентов, преподаватель, предмет и 12 оценок; порядок дат не совпадает с порядком id
+    db.add(models.Group(id=1, name="G1"))
+    db.add_all([models.Person(id=i, first_name=f"S{i}", last_name="Student", group_id=1, type="S") for i in (1, 2, 3)])
+    db.add(models.Person(id=10, first_name="T", last_name="Teacher", type="P"))
+    db.add(models.Subject(id=1, name="Math"))
+    start = datetime(2024, 9, 2, 9)
+    db.add_all([
+        models.Mark(student_id=1 + n % 3, subject_id=1, teacher_id=10, value=2 + n % 4, created_at=start + timedelta(days=(n * 5) % 12))
+        for n in range(12)
+    ])
+    db.commit()
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from app.archive import archive_horizon, archive_marks
+from app.models import Group, Mark, MarkArchive
+from app.pagination import NEXT_CURSOR_HEADER
+from test_rollups import rollups
+
+CUTOFF = datetime(2024, 9, 8)
+
+QUERIES = [
+    {},
+    {"sort": "-value"},
+    {"created_from": "2024-09-05"},
+    {"created_from": "2024-09-10"},
+    {"created_to": "2024-09-06"},
+    {"student_id": 2},
+    {"group_id": 1, "sort": "value"},
+]
+
+
+def read_all(client, params: dict) -> list:
+    # Все страницы GET /marks по X-Next-Cursor
+    marks, cursor = [], None
+    while True:
+        page_params = dict(params, limit=5, fields="id,student_id,value,created_at")
+        if cursor:
+            page_params["cursor"] = cursor
+        response = client.get("/marks/", params=page_params)
+        assert response.status_code == 200
+        marks += response.json()
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return marks
+
+
+def archive(db, **kwargs) -> dict:
+    report = archive_marks(db, **kwargs)
+    archive_horizon.invalidate()
+    return report
+
+
+def test_archive_moves_old_marks(db, marks_data):
+    before = rollups(db)
+    report = archive(db, cutoff=CUTOFF, batch_size=2)
+    archived = db.query(MarkArchive).count()
+    assert report["moved"] == archived > 0
+    assert report["batches"] == (archived + 1) // 2
+    assert db.query(Mark).count() == 12 - archived
+    assert db.query(Mark).filter(Mark.created_at < CUTOFF).count() == 0
+    # Триггеры вычли пачку из marks и добавили её из архива
+    assert rollups(db) == before
+    # Повторный запуск ничего не переносит
+    assert archive(db, cutoff=CUTOFF)["moved"] == 0
+
+
+@pytest.mark.parametrize("params", QUERIES)
+def test_reads_are_unchanged_by_archive(client, db, marks_data, params):
+    before = read_all(client, params)
+    assert before
+    archive(db, cutoff=CUTOFF)
+    assert db.query(MarkArchive).count() > 0
+    assert read_all(client, params) == before
+
+
+def test_graduated_group_is_archived_and_still_read(client, db, marks_data):
+    before = read_all(client, {"group_id": 1})
+    db.get(Group, 1).graduated_at = datetime(2024, 9, 20)
+    db.commit()
+    assert archive(db, cutoff=datetime(2000, 1, 1))["moved"] == 12
+    assert read_all(client, {"group_id": 1}) == before
+    assert read_all(client, {"student_id": 3}) == [mark for mark in before if mark["student_id"] == 3]
+
+
+def test_average_grade_is_unchanged_by_archive(auth_client, db, marks_data):
+    request = {"start_date": "2024-09-01", "end_date": "2024-09-30", "filter_by": "students"}
+    before = auth_client.post("/average_grade/calculate-average-grade", json=request).json()
+    archive(db, cutoff=CUTOFF)
+    assert auth_client.post("/average_grade/calculate-average-grade", json=request).json() == before
+
+
+def test_archived_mark_is_read_only(client, db, marks_data):
+    archive(db, cutoff=CUTOFF)
+    mark_id = db.query(MarkArchive.id).order_by(MarkArchive.id).first()[0]
+    payload = {"student_id": 1, "subject_id": 1, "teacher_id": 10, "value": 5}
+    for response in (client.put(f"/marks/{mark_id}", json=payload), client.delete(f"/marks/{mark_id}")):
+        assert response.status_code == 409
+        assert response.json() == {"detail": f"Mark {mark_id} is archived and read-only"}
+    assert db.get(MarkArchive, mark_id) is not None
+    assert client.delete("/marks/100000").status_code == 404
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select, update
+
+from app import auth
+from app.models import Person, RefreshToken, User
+from app.utils import hash_password
+
+
+@pytest.fixture
+def users(db):
+    # UserRead требует person_id, поэтому учётные записи связаны с людьми
+    db.add_all([Person(id=i, first_name=f"P{i}", last_name="Staff", type="P") for i in (1, 2)])
+    db.add_all([
+        User(id=1, login="admin", password_hash=hash_password("admin-pw"), role="admin", person_id=1),
+        User(id=2, login="clerk", password_hash=hash_password("clerk-pw"), role="user", person_id=2),
+    ])
+    db.commit()
+
+
+def login(client, username):
+    response = client.post("/auth/token", data={"username": username, "password": f"{username}-pw"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def bearer(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def refresh(client, token):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_wrong_password_is_rejected(auth_client, users):
+    assert auth_client.post("/auth/token", data={"username": "admin", "password": "nope"}).status_code == 401
+
+
+def test_invalid_access_token_is_rejected(auth_client, users):
+    tokens = login(auth_client, "admin")
+    tampered = {"access_token": tokens["access_token"][:-2] + "xx"}
+    assert auth_client.get("/users/", headers=bearer(tampered)).status_code == 401
+
+
+def test_claims_fast_path_does_not_query_users(auth_client, users, async_engine):
+    # Роль берётся из подписанных claims, версия токена - из кэша: повторный запрос не читает users
+    tokens = login(auth_client, "admin")
+    assert auth_client.get("/users/", headers=bearer(tokens)).status_code == 200
+    statements = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert auth_client.post("/users/2/revoke-tokens", headers=bearer(tokens)).status_code == 200
+    assert not [statement for statement in statements if "token_version" in statement and "UPDATE" not in statement]
+
+
+def test_claims_carry_role(auth_client, users):
+    tokens = login(auth_client, "clerk")
+    assert auth_client.post("/users/1/revoke-tokens", headers=bearer(tokens)).status_code == 403
+
+
+def test_revoke_tokens_rejects_access_token(auth_client, users):
+    admin, clerk = login(auth_client, "admin"), login(auth_client, "clerk")
+    assert auth_client.get("/users/2", headers=bearer(clerk)).status_code != 401
+    assert auth_client.post("/users/2/revoke-tokens", headers=bearer(admin)).status_code == 200
+    response = auth_client.get("/users/2", headers=bearer(clerk))
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked"}
+    assert auth_client.get("/users/", headers=bearer(admin)).status_code == 200
+    assert auth_client.get("/users/2", headers=bearer(login(auth_client, "clerk"))).status_code != 401
+
+
+def test_revocation_by_other_worker(auth_client, users, db, monkeypatch):
+    # Запись в users мимо этого процесса видна через счётчик table_versions после очередной сверки
+    monkeypatch.setattr(auth, "TOKEN_VERSION_POLL_INTERVAL", 0)
+    tokens = login(auth_client, "admin")
+    assert auth_client.get("/users/", headers=bearer(tokens)).status_code == 200
+    db.execute(update(User).where(User.id == 1).values(token_version=User.token_version + 1))
+    db.commit()
+    assert auth_client.get("/users/", headers=bearer(tokens)).status_code == 401
+
+
+def test_deleted_user_is_rejected(auth_client, users):
+    admin, clerk = login(auth_client, "admin"), login(auth_client, "clerk")
+    assert auth_client.delete("/users/2", headers=bearer(admin)).status_code == 200
+    response = auth_client.get("/users/2", headers=bearer(clerk))
+    assert response.status_code == 401
+    assert response.json() == {"detail": "User not found"}
+
+
+def test_refresh_rotates_within_session(auth_client, users, db):
+    tokens = login(auth_client, "admin")
+    expires_at = db.scalar(select(RefreshToken.expires_at))
+    current = tokens["refresh_token"]
+    for _ in range(3):
+        response = refresh(auth_client, current)
+        assert response.status_code == 200
+        assert response.json()["refresh_token"] != current
+        assert auth_client.get("/users/", headers=bearer(response.json())).status_code == 200
+        current = response.json()["refresh_token"]
+    # Одна строка на сессию, срок сессии ротацией не продлевается
+    db.expire_all()
+    assert db.scalars(select(RefreshToken.expires_at)).all() == [expires_at]
+
+
+def test_refresh_reuse_revokes_sessions(auth_client, users):
+    first = login(auth_client, "admin")["refresh_token"]
+    other = login(auth_client, "admin")["refresh_token"]
+    second = refresh(auth_client, first).json()["refresh_token"]
+    third = refresh(auth_client, second).json()["refresh_token"]
+    # Токен двумя ротациями раньше всё равно распознаётся как повторное предъявление
+    assert refresh(auth_client, first).status_code == 401
+    assert refresh(auth_client, third).status_code == 401
+    assert refresh(auth_client, other).status_code == 401
+
+
+def test_refresh_after_revoke_tokens(auth_client, users):
+    admin, clerk = login(auth_client, "admin"), login(auth_client, "clerk")
+    assert auth_client.post("/users/2/revoke-tokens", headers=bearer(admin)).status_code == 200
+    assert refresh(auth_client, clerk["refresh_token"]).status_code == 401
+    assert refresh(auth_client, admin["refresh_token"]).status_code == 200
+
+
+def test_refresh_after_logout(auth_client, users):
+    tokens = login(auth_client, "admin")
+    assert auth_client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+    assert refresh(auth_client, tokens["refresh_token"]).status_code == 401
+
+
+def test_refresh_rejects_expired_and_unknown_tokens(auth_client, users, db):
+    tokens = login(auth_client, "admin")
+    db.execute(update(RefreshToken).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+    assert refresh(auth_client, tokens["refresh_token"]).status_code == 401
+    assert refresh(auth_client, "garbage").status_code == 401
+    assert refresh(auth_client, "unknown.session").status_code == 401
+
+
+def test_refresh_removes_stale_sessions(auth_client, users, db):
+    # Отозванные и истёкшие сессии удаляются при ротации, даже если пользователь не входит по паролю заново
+    live, revoked, expired = (login(auth_client, "admin")["refresh_token"] for _ in range(3))
+    session = {token: token.partition(".")[0] for token in (live, revoked, expired)}
+    db.execute(update(RefreshToken).where(RefreshToken.session_id == session[revoked]).values(revoked_at=datetime.utcnow()))
+    db.execute(update(RefreshToken).where(RefreshToken.session_id == session[expired])
+               .values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+    assert refresh(auth_client, live).status_code == 200
+    db.expire_all()
+    assert db.scalars(select(RefreshToken.session_id)).all() == [session[live]]
+
+
+@pytest.mark.parametrize("path, payload", [
+    ("/average_grade/ranking", {"start_date": "2024-09-01", "end_date": "2025-08-31", "partition_by": "subject"}),
+    ("/average_grade/trend", {"start_date": "2024-09-01", "end_date": "2025-08-31", "bucket": "month"}),
+])
+def test_reports_require_authentication(auth_client, users, path, payload):
+    assert auth_client.post(path, json=payload).status_code == 401
+    assert auth_client.post(path, json=payload, headers=bearer(login(auth_client, "clerk"))).status_code == 200
@@ -0,0 +1,79 @@
+from sqlalchemy import func, select
+
+from app.models import Mark, User
+from app.provisioning import LOGIN_MAX_LENGTH
+from app.utils import pwd_context
+
+MARK = {"student_id": 1, "subject_id": 1, "teacher_id": 10, "value": 5}
+
+
+def test_marks_bulk_size_limits(client, marks_data):
+    assert client.post("/marks/bulk", json={"marks": []}).status_code == 422
+    assert client.post("/marks/bulk", json={"marks": [MARK] * 10001}).status_code == 422
+
+
+def test_marks_bulk_reports_bad_rows(client, marks_data, db):
+    before = db.scalar(select(func.count()).select_from(Mark))
+    rows = [
+        MARK,
+        dict(MARK, value=7),
+        dict(MARK, student_id=10),
+        dict(MARK, teacher_id=2),
+        dict(MARK, student_id=99),
+        dict(MARK, subject_id=99),
+        dict(MARK, value=3, created_at="2024-09-05T10:00:00"),
+    ]
+    response = client.post("/marks/bulk", json={"marks": rows})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["inserted"] == 2 and len(result["ids"]) == 2
+    assert result["errors"] == [
+        {"index": 1, "detail": "Value must be between 2 and 5"},
+        {"index": 2, "detail": "Person 10 is not a student"},
+        {"index": 3, "detail": "Person 2 is not a teacher"},
+        {"index": 4, "detail": "Student 99 not found"},
+        {"index": 5, "detail": "Subject 99 not found"},
+    ]
+    assert db.scalar(select(func.count()).select_from(Mark)) == before + 2
+
+
+def test_create_mark_reference_errors(client, marks_data):
+    assert client.post("/marks/", json=dict(MARK, student_id=10)).status_code == 400
+    assert client.post("/marks/", json=dict(MARK, student_id=99)).status_code == 404
+
+
+def test_users_bulk_size_limits(client):
+    user = {"login": "u", "password": "p"}
+    assert client.post("/users/bulk", json={"users": []}).status_code == 422
+    assert client.post("/users/bulk", json={"users": [user] * 10001}).status_code == 422
+
+
+def test_users_bulk_reports_bad_rows(client, marks_data, db):
+    db.add(User(login="taken", password_hash="x", role="user"))
+    db.commit()
+    rows = [
+        {"login": "s1", "password": "secret", "person_id": 1},
+        {"login": "s1", "password": "secret"},
+        {"login": "", "password": "secret"},
+        {"login": "nopass", "password": ""},
+        {"login": "boss", "password": "secret", "role": "root"},
+        {"login": "ghost", "password": "secret", "person_id": 99},
+        {"login": "taken", "password": "secret"},
+        {"login": "t10", "password": "other", "role": "admin", "person_id": 10},
+    ]
+    response = client.post("/users/bulk", json={"users": rows})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 2
+    assert [(error["index"], error["detail"]) for error in result["errors"]] == [
+        (1, "Duplicate login in request"),
+        (2, f"Login must be 1-{LOGIN_MAX_LENGTH} characters"),
+        (3, "Password is required"),
+        (4, "Role must be one of user, admin"),
+        (5, "Person 99 not found"),
+        (6, "Login already registered"),
+    ]
+    created = {user.login: user for user in db.scalars(select(User).where(User.id.in_(result["ids"])))}
+    assert set(created) == {"s1", "t10"}
+    assert pwd_context.verify("other", created["t10"].password_hash)
+    assert created["t10"].role == "admin" and created["t10"].person_id == 10
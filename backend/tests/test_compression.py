@@ -0,0 +1,125 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, _accepted
+from app.etags import not_modified
+
+BODY = "оценка;" * 1000
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(BODY, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((BODY for _ in range(3)), media_type="text/plain")
+
+    @app.get("/cached/{size}")
+    def cached(size: int, request: Request):
+        response = Response(media_type="text/plain")
+        cached = not_modified(request, response, '"v2"')
+        if cached:
+            return cached
+        return PlainTextResponse("x" * size, headers=dict(response.headers))
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(BODY.encode()), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.1, gzip", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.0, gzip;q=0", None),
+    ("*", "br"),
+    ("identity", None),
+    ("", None),
+])
+def test_accepted(accept_encoding, expected):
+    assert _accepted(accept_encoding) == expected
+
+
+def raw_get(client, path, accept_encoding):
+    # httpx сам распаковывает ответ, поэтому тело читается сырым потоком
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("accept_encoding, encoding, decompress", [
+    ("gzip, br", "br", brotli.decompress),
+    ("gzip", "gzip", gzip.decompress),
+])
+def test_large_response_is_compressed(client, accept_encoding, encoding, decompress):
+    response, body = raw_get(client, "/large", accept_encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == f'"v1-{encoding}"'
+    assert int(response.headers["content-length"]) == len(body)
+    assert decompress(body).decode() == BODY
+
+
+@pytest.mark.parametrize("path, accept_encoding", [
+    ("/large", "identity"),
+    ("/large", "gzip;q=0"),
+    ("/small", "gzip, br"),
+])
+def test_uncompressed_response_varies(client, path, accept_encoding):
+    response, _ = raw_get(client, path, accept_encoding)
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_uncompressed_etag_is_unchanged(client):
+    response, body = raw_get(client, "/large", "identity")
+    assert response.headers["etag"] == '"v1"'
+    assert body.decode() == BODY
+
+
+def test_streaming_response_is_compressed(client):
+    response, body = raw_get(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body).decode() == BODY * 3
+
+
+def test_encoded_response_is_passed_through(client):
+    response, body = raw_get(client, "/encoded", "br")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body).decode() == BODY
+
+
+@pytest.mark.parametrize("size, expected", [(10, '"v2"'), (5000, '"v2-br"')])
+def test_not_modified_keeps_validator_of_cached_response(client, size, expected):
+    # 304 повторяет ETag того ответа 200, который клиент сохранил
+    response, _ = raw_get(client, f"/cached/{size}", "br")
+    assert response.status_code == 200
+    assert response.headers["etag"] == expected
+    revalidated = client.get(f"/cached/{size}", headers={"Accept-Encoding": "br", "If-None-Match": expected})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == expected
+    assert revalidated.headers["vary"] == "Accept-Encoding"
+
+
+def test_not_modified_keeps_suffix_of_other_encoding(client):
+    revalidated = client.get("/cached/5000", headers={"Accept-Encoding": "br", "If-None-Match": '"v2-gzip"'})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == '"v2-gzip"'
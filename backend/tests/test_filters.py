@@ -0,0 +1,64 @@
+import pytest
+from fastapi import HTTPException
+
+from app.filters import mark_projection
+from app.pagination import NEXT_CURSOR_HEADER
+from app.serialization import MARK_LIST_COLUMNS
+
+
+def test_projection_defaults_to_list_columns():
+    columns, joins, tables = mark_projection()
+    assert [column.key for column in columns] == list(MARK_LIST_COLUMNS)
+    assert joins == [] and tables == ()
+
+
+def test_projection_fields_and_expand():
+    columns, joins, tables = mark_projection(fields="value, student_name,value,id", expand="student,teacher,student")
+    assert [column.key for column in columns] == ["value", "student_name", "id"]
+    assert len(joins) == 2
+    assert tables == ("people",)
+
+
+@pytest.mark.parametrize("fields, expand, detail", [
+    ("id,password", None, "Unknown fields: password"),
+    ("student_name", None, "Unknown fields: student_name"),  # имя доступно только с ?expand=student
+    (None, "student,group", "Unknown expand: group"),
+])
+def test_projection_rejects_unknown_names(fields, expand, detail):
+    with pytest.raises(HTTPException) as error:
+        mark_projection(fields=fields, expand=expand)
+    assert error.value.status_code == 400
+    assert error.value.detail == detail
+
+
+def test_unknown_field_returns_400(client, marks_data):
+    response = client.get("/marks/", params={"fields": "id,secret"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown fields: secret"}
+
+
+def test_hidden_sort_keys_are_cut_from_response(client, marks_data):
+    # created_at и id нужны для курсора, но в ответ попадает только value
+    values, cursor = [], None
+    while True:
+        params = {"fields": "value", "sort": "created_at", "limit": 5}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/marks/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(list(mark) == ["value"] for mark in page)
+        values += [mark["value"] for mark in page]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    expected = client.get("/marks/", params={"sort": "created_at", "limit": 100}).json()
+    assert values == [mark["value"] for mark in expected]
+
+
+def test_hidden_sort_keys_in_columns_format(client, marks_data):
+    response = client.get("/marks/", params={"fields": "student_name", "expand": "student", "sort": "-value", "limit": 4, "format": "columns"})
+    assert response.status_code == 200
+    assert list(response.json()) == ["student_name"]
+    assert len(response.json()["student_name"]) == 4
+    assert response.headers[NEXT_CURSOR_HEADER]
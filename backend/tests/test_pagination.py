@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import Mark
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    keys = [Mark.created_at, Mark.id]
+    values = [datetime(2024, 9, 2, 9, 30, 15, 120), 42]
+    assert decode_cursor(encode_cursor(values), keys) == values
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor([datetime(2024, 9, 2), 10 ** 12])
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode_cursor([1]),  # ключей сортировки два
+    encode_cursor(["yesterday", 1]),
+    encode_cursor([datetime(2024, 9, 2).isoformat(), "x"]),
+    encode_cursor([datetime(2024, 9, 2), 1])[:-3],
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, [Mark.created_at, Mark.id])
+    assert error.value.status_code == 400
+
+
+def test_pages_cover_list_once(client, marks_data):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 5, "sort": "-created_at"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/marks/", params=params)
+        assert response.status_code == 200
+        seen += [(mark["created_at"], mark["id"]) for mark in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    assert len(seen) == 12
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_tampered_cursor_returns_400(client, marks_data):
+    response = client.get("/marks/", params={"cursor": "bm90LWpzb24"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
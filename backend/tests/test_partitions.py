@@ -0,0 +1,33 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from app.partitions import academic_year, ensure_mark_partitions, ensure_mark_partitions_if_ready
+
+
+def test_academic_year():
+    assert academic_year(date(2024, 8, 31)) == 2023
+    assert academic_year(date(2024, 9, 1)) == 2024
+
+
+def test_ensure_partitions_ahead(db):
+    connection = db.connection()
+    assert ensure_mark_partitions(connection, today=date(2024, 3, 1), ahead=2) == ["marks_y2023", "marks_y2024", "marks_y2025"]
+    # Повторный вызов ничего не создаёт заново
+    assert ensure_mark_partitions(connection, today=date(2024, 3, 1), ahead=0) == ["marks_y2023"]
+
+
+def test_marks_in_default_partition_move_to_new_partition(db, marks_data):
+    connection = db.connection()
+    assert connection.execute(text("SELECT count(*) FROM marks_default")).scalar() == 12
+    assert ensure_mark_partitions(connection, today=date(2020, 3, 1), ahead=0) == ["marks_y2019", "marks_y2024"]
+    assert connection.execute(text("SELECT count(*) FROM marks_default")).scalar() == 0
+    assert connection.execute(text("SELECT count(*) FROM marks_y2024")).scalar() == 12
+
+
+def test_unmigrated_database_is_skipped(db, caplog):
+    # Секционирование ещё не применено (поэтапный выкат): запуск не падает, а пишет предупреждение
+    connection = db.connection()
+    connection.execute(text("DROP FUNCTION marks_ensure_partition(date)"))
+    assert ensure_mark_partitions_if_ready(connection) is None
+    assert "not partitioned yet" in caplog.text
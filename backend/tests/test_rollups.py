@@ -0,0 +1,58 @@
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from app.models import Mark
+from app.partitions import ensure_mark_partitions
+
+# Агрегаты, посчитанные напрямую по marks и marks_archive, - с ними сверяется mark_rollups
+EXPECTED_ROLLUPS = """
+    SELECT d.dimension, m.created_at::date, d.entity_id, sum(m.value), count(*)
+    FROM (SELECT student_id, subject_id, teacher_id, value, created_at FROM marks
+          UNION ALL SELECT student_id, subject_id, teacher_id, value, created_at FROM marks_archive) m
+    CROSS JOIN LATERAL (VALUES ('student', m.student_id), ('teacher', m.teacher_id), ('subject', m.subject_id)) AS d(dimension, entity_id)
+    GROUP BY 1, 2, 3
+"""
+
+
+def rollups(db) -> dict:
+    # Строки с нулевым количеством остаются после удалений и на средние не влияют
+    rows = db.execute(text("SELECT dimension, day, entity_id, value_sum, value_count FROM mark_rollups WHERE value_count <> 0"))
+    return {(dimension, day, entity_id): (value_sum, count) for dimension, day, entity_id, value_sum, count in rows}
+
+
+def expected_rollups(db) -> dict:
+    return {(dimension, day, entity_id): (value_sum, count) for dimension, day, entity_id, value_sum, count in db.execute(text(EXPECTED_ROLLUPS))}
+
+
+def test_insert_updates_rollups(db, marks_data):
+    assert rollups(db) == expected_rollups(db)
+    assert len(rollups(db)) > 0
+    db.add(Mark(student_id=1, subject_id=1, teacher_id=10, value=5, created_at=datetime(2024, 9, 2, 15)))
+    db.commit()
+    assert rollups(db) == expected_rollups(db)
+    assert rollups(db)[("student", date(2024, 9, 2), 1)][1] == 2
+
+
+def test_update_across_partitions_moves_rollups(db, marks_data):
+    # Оценка переносится в секцию прошлого учебного года: вклад уходит со старого дня и студента на новые
+    ensure_mark_partitions(db.connection(), today=date(2024, 3, 1), ahead=1)
+    db.commit()
+    mark = db.query(Mark).order_by(Mark.id).first()
+    old_key = ("student", mark.created_at.date(), mark.student_id)
+    old_count = rollups(db)[old_key][1]
+    mark.created_at = datetime(2023, 10, 1, 10)
+    mark.student_id = 3 if mark.student_id != 3 else 2
+    mark.value = 5
+    db.commit()
+    assert db.execute(text("SELECT count(*) FROM marks_y2023")).scalar() == 1
+    assert rollups(db) == expected_rollups(db)
+    assert rollups(db).get(old_key, (0, 0))[1] == old_count - 1
+    assert rollups(db)[("student", date(2023, 10, 1), mark.student_id)] == (5, 1)
+
+
+def test_delete_updates_rollups(db, marks_data):
+    db.query(Mark).filter(Mark.student_id == 2).delete()
+    db.commit()
+    assert rollups(db) == expected_rollups(db)
+    assert not any(dimension == "student" and entity_id == 2 for dimension, _, entity_id in rollups(db))
@@ -0,0 +1,53 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from app.schemas import MarkRead
+from app.serialization import MARK_LIST_COLUMNS, list_responses, rows_json
+
+
+def test_rows_json_objects():
+    rows = [(1, 2, 3, 5, 10, datetime(2024, 9, 2, 9, 30)), (1, 2, 3, 4, 11, datetime(2024, 9, 3))]
+    assert json.loads(rows_json(list(MARK_LIST_COLUMNS), rows)) == [
+        {"student_id": 1, "subject_id": 2, "teacher_id": 3, "value": 5, "id": 10, "created_at": "2024-09-02T09:30:00"},
+        {"student_id": 1, "subject_id": 2, "teacher_id": 3, "value": 4, "id": 11, "created_at": "2024-09-03T00:00:00"},
+    ]
+
+
+def test_rows_json_decimal():
+    assert json.loads(rows_json(["average"], [(Decimal("3.25"),)])) == [{"average": 3.25}]
+
+
+def test_marks_list_matches_mark_read(client, marks_data):
+    # Ответ Core-пути совпадает с тем, что отдавала сериализация ORM-объектов через MarkRead
+    response = client.get("/marks/", params={"limit": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert [list(mark) for mark in body] == [list(MarkRead.model_fields)] * 3
+    assert [MarkRead(**mark).model_dump(mode="json") for mark in body] == body
+
+
+def test_rows_json_columns():
+    rows = [(10, 5, datetime(2024, 9, 2)), (11, 4, datetime(2024, 9, 3))]
+    assert json.loads(rows_json(["id", "value", "created_at"], rows, "columns")) == {
+        "id": [10, 11],
+        "value": [5, 4],
+        "created_at": ["2024-09-02T00:00:00", "2024-09-03T00:00:00"],
+    }
+
+
+def test_rows_json_columns_empty():
+    # Пустая страница сохраняет имена столбцов
+    assert json.loads(rows_json(["id", "value"], [], "columns")) == {"id": [], "value": []}
+
+
+def test_marks_list_columns(client, marks_data):
+    objects = client.get("/marks/", params={"limit": 4}).json()
+    columns = client.get("/marks/", params={"limit": 4, "format": "columns"}).json()
+    assert columns == {name: [mark[name] for mark in objects] for name in MARK_LIST_COLUMNS}
+
+
+def test_list_responses_documents_both_formats():
+    objects, columns = list_responses(MarkRead, "marks")[200]["content"]["application/json"]["schema"]["oneOf"]
+    assert list(objects["items"]["properties"]) == list(MarkRead.model_fields)
+    assert columns["properties"]["created_at"] == {"type": "array", "items": objects["items"]["properties"]["created_at"]}
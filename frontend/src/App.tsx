@@ -7,11 +7,12 @@ import PeoplePage from "./pages/PeoplePage";
 import SubjectsPage from "./pages/SubjectsPage";
 import MarksPage from "./pages/MarksPage";
 import AnalyticsPage from "./pages/AnalyticsPage";
+import { logout } from "./services/auth";
 
 const App: React.FC = () => {
   // Обработчик выхода из аккаунта
-  const handleLogout = () => {
-    localStorage.removeItem("token");
+  const handleLogout = async () => {
+    await logout();
     localStorage.removeItem("username");
     window.location.href = "/"; // Перенаправление на страницу входа
   };
@@ -2,6 +2,7 @@
 import React from "react";
 import ReactDOM from "react-dom/client";
 import App from "./App";
+import "./services/auth"; // Registers the token refresh interceptor
 
 // CDN import for Montserrat
 const link = document.createElement("link");
@@ -35,6 +35,12 @@ interface AverageGradeResponse {
   average_grade: number;
 }
 
+// Ответ в формате ?format=columns: параллельные массивы вместо массива объектов
+interface AverageGradeColumns {
+  entity: string[];
+  average_grade: number[];
+}
+
 const AnalyticsPage = () => {
   // Стейт для хранения данных формы
   const [startDate, setStartDate] = useState<string>("2020-12-12");
@@ -59,13 +65,15 @@ const AnalyticsPage = () => {
 
     try {
       // Отправка запроса
-      const response = await axios.post<AverageGradeResponse[]>(
+      const response = await axios.post<AverageGradeColumns>(
         "http://localhost:8000/average_grade/calculate-average-grade",
-        requestData
+        requestData,
+        { params: { format: "columns" } }
       );
 
       // Обновление стейта с результатами
-      setGrades(response.data);
+      const { entity, average_grade } = response.data;
+      setGrades(entity.map((name, index) => ({ entity: name, average_grade: average_grade[index] })));
     } catch (err) {
       // Обработка ошибок
       setError("Error: Unable to fetch average grades");
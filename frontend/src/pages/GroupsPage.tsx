@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { fetchAllPages } from "../services/pagination";
 import { toast, ToastContainer } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 import "./styles.css";
@@ -26,11 +27,11 @@ const GroupsPage: React.FC = () => {
         throw new Error("No token found. Please log in.");
       }
 
-      const response = await axios.get("http://localhost:8000/groups", {
+      const groups = await fetchAllPages<Group>("http://localhost:8000/groups", {
         headers: { Authorization: `Bearer ${token}` },
       });
 
-      setGroups(response.data);
+      setGroups(groups);
     } catch (error) {
       toast.error("Failed to fetch groups.");
     }
@@ -2,6 +2,7 @@ import React, { useState } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import qs from "qs";
+import { saveTokens } from "../services/auth";
 
 const LoginPage: React.FC = () => {
   const [username, setUsername] = useState("");
@@ -21,9 +22,9 @@ const LoginPage: React.FC = () => {
         }
       );
 
-      const { access_token, person } = response.data;
+      const { access_token, refresh_token, person } = response.data;
 
-      localStorage.setItem("token", access_token);
+      saveTokens(access_token, refresh_token);
       localStorage.setItem("login", username);
 
       if (person) {
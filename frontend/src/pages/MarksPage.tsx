@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { fetchAllPages } from "../services/pagination";
 import { toast, ToastContainer } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 
@@ -9,8 +10,18 @@ interface Mark {
   subject_id: number;
   teacher_id: number;
   value: number;
+  // Имена приходят в том же ответе благодаря ?expand=student,teacher,subject
+  student_name: string;
+  teacher_name: string;
+  subject_name: string;
 }
 
+// Столбцы, которые нужны списку оценок; остальные сервер не отправляет
+const MARK_LIST_PARAMS = {
+  fields: "id,student_id,subject_id,teacher_id,value,student_name,teacher_name,subject_name",
+  expand: "student,teacher,subject",
+};
+
 interface Person {
   id: number;
   first_name: string;
@@ -48,11 +59,12 @@ const MarksPage: React.FC = () => {
       const token = localStorage.getItem("token");
       if (!token) throw new Error("No token found. Please log in.");
 
-      const response = await axios.get("http://localhost:8000/marks", {
+      const marks = await fetchAllPages<Mark>("http://localhost:8000/marks", {
         headers: { Authorization: `Bearer ${token}` },
+        params: MARK_LIST_PARAMS,
       });
 
-      setMarks(response.data);
+      setMarks(marks);
     } catch (error) {
       console.error("Failed to fetch marks:", error);
     }
@@ -63,11 +75,10 @@ const MarksPage: React.FC = () => {
       const token = localStorage.getItem("token");
       if (!token) throw new Error("No token found. Please log in.");
 
-      const response = await axios.get("http://localhost:8000/people", {
+      const people = await fetchAllPages<Person>("http://localhost:8000/people", {
         headers: { Authorization: `Bearer ${token}` },
       });
 
-      const people = response.data as Person[];
       setStudents(people.filter((person) => person.type === "S"));
       setTeachers(people.filter((person) => person.type === "P"));
     } catch (error) {
@@ -80,11 +91,11 @@ const MarksPage: React.FC = () => {
       const token = localStorage.getItem("token");
       if (!token) throw new Error("No token found. Please log in.");
 
-      const response = await axios.get("http://localhost:8000/subjects", {
+      const subjects = await fetchAllPages<Subject>("http://localhost:8000/subjects", {
         headers: { Authorization: `Bearer ${token}` },
       });
 
-      setSubjects(response.data);
+      setSubjects(subjects);
     } catch (error) {
       console.error("Failed to fetch subjects:", error);
     }
@@ -176,21 +187,6 @@ const MarksPage: React.FC = () => {
     return `${person.last_name} ${person.first_name} ${person.father_name}`;
   };
 
-  const getStudentName = (id: number) => {
-    const student = students.find((s) => s.id === id);
-    return student ? formatName(student) : "Unknown";
-  };
-
-  const getTeacherName = (id: number) => {
-    const teacher = teachers.find((t) => t.id === id);
-    return teacher ? formatName(teacher) : "Unknown";
-  };
-
-  const getSubjectName = (id: number) => {
-    const subject = subjects.find((s) => s.id === id);
-    return subject ? subject.name : "Unknown";
-  };
-
   return (
     <div>
       <ToastContainer />
@@ -246,9 +242,8 @@ const MarksPage: React.FC = () => {
       <ul>
         {marks.map((mark) => (
           <li key={mark.id}>
-            Student: {getStudentName(mark.student_id)}, Subject:{" "}
-            {getSubjectName(mark.subject_id)}, Teacher:{" "}
-            {getTeacherName(mark.teacher_id)}, Grade: {mark.value}
+            Student: {mark.student_name}, Subject: {mark.subject_name}, Teacher:{" "}
+            {mark.teacher_name}, Grade: {mark.value}
             <button onClick={() => deleteMark(mark.id)}>Delete</button>
             <button onClick={() => setEditingMark(mark)}>Edit</button>
           </li>
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { fetchAllPages } from "../services/pagination";
 
 interface Person {
   id: number;
@@ -38,11 +39,11 @@ const PeoplePage: React.FC = () => {
       const token = localStorage.getItem("token");
       if (!token) throw new Error("No token found. Please log in.");
 
-      const response = await axios.get("http://localhost:8000/people", {
+      const people = await fetchAllPages<Person>("http://localhost:8000/people", {
         headers: { Authorization: `Bearer ${token}` },
       });
 
-      setPeople(response.data);
+      setPeople(people);
     } catch (error) {
       console.error("Failed to fetch people:", error);
     }
@@ -53,11 +54,11 @@ const PeoplePage: React.FC = () => {
       const token = localStorage.getItem("token");
       if (!token) throw new Error("No token found. Please log in.");
 
-      const response = await axios.get("http://localhost:8000/groups", {
+      const groups = await fetchAllPages<Group>("http://localhost:8000/groups", {
         headers: { Authorization: `Bearer ${token}` },
       });
 
-      setGroups(response.data);
+      setGroups(groups);
     } catch (error) {
       console.error("Failed to fetch groups:", error);
     }
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { fetchAllPages } from "../services/pagination";
 import { toast, ToastContainer } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 
@@ -22,10 +23,10 @@ const SubjectsPage: React.FC = () => {
       const token = localStorage.getItem("token");
       if (!token) throw new Error("No token found. Please log in.");
 
-      const response = await axios.get("http://localhost:8000/subjects", {
+      const subjects = await fetchAllPages<Subject>("http://localhost:8000/subjects", {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setSubjects(response.data);
+      setSubjects(subjects);
     } catch (error) {
       toast.error("Failed to fetch subjects.");
     }
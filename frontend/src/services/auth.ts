@@ -0,0 +1,60 @@
+// src/services/auth.ts
+import axios, { AxiosError, InternalAxiosRequestConfig } from "axios";
+
+const AUTH_URL = "http://localhost:8000/auth";
+
+// Save the token pair returned by /auth/token and /auth/refresh
+export const saveTokens = (accessToken: string, refreshToken: string) => {
+  localStorage.setItem("token", accessToken);
+  localStorage.setItem("refresh_token", refreshToken);
+};
+
+// Revoke the refresh token on the server and forget both tokens
+export const logout = async () => {
+  const refreshToken = localStorage.getItem("refresh_token");
+  localStorage.removeItem("token");
+  localStorage.removeItem("refresh_token");
+  if (refreshToken) {
+    await axios.post(`${AUTH_URL}/logout`, { refresh_token: refreshToken }).catch(() => undefined);
+  }
+};
+
+// One refresh at a time: parallel requests that got 401 wait for the same new token
+let refreshing: Promise<string> | null = null;
+
+const refreshAccessToken = (): Promise<string> => {
+  if (!refreshing) {
+    const refreshToken = localStorage.getItem("refresh_token");
+    refreshing = (
+      refreshToken
+        ? axios.post(`${AUTH_URL}/refresh`, { refresh_token: refreshToken }).then((response) => {
+            saveTokens(response.data.access_token, response.data.refresh_token);
+            return response.data.access_token as string;
+          })
+        : Promise.reject(new Error("No refresh token"))
+    ).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
+// When the access token expires, get a new one with the refresh token and retry the request once.
+// The password is asked again only if the refresh token is expired or revoked.
+axios.interceptors.response.use(undefined, async (error: AxiosError) => {
+  const config = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
+  if (error.response?.status !== 401 || !config || config._retried || config.url?.startsWith(AUTH_URL)) {
+    return Promise.reject(error);
+  }
+  config._retried = true;
+  try {
+    const accessToken = await refreshAccessToken();
+    config.headers.Authorization = `Bearer ${accessToken}`;
+    return axios.request(config);
+  } catch {
+    localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
+    window.location.href = "/";
+    return Promise.reject(error);
+  }
+});
@@ -0,0 +1,25 @@
+// src/services/pagination.ts
+import axios, { AxiosRequestConfig } from "axios";
+
+// The backend returns the cursor of the next page in this header
+const NEXT_CURSOR_HEADER = "x-next-cursor";
+
+// Fetch every page of a cursor-paginated list endpoint
+export const fetchAllPages = async <T>(
+  url: string,
+  config: AxiosRequestConfig = {}
+): Promise<T[]> => {
+  const items: T[] = [];
+  let cursor: string | undefined;
+
+  do {
+    const response = await axios.get<T[]>(url, {
+      ...config,
+      params: { ...config.params, limit: 1000, cursor },
+    });
+    items.push(...response.data);
+    cursor = response.headers[NEXT_CURSOR_HEADER];
+  } while (cursor);
+
+  return items;
+};